@@ -0,0 +1,65 @@
+"""store consultation timestamps as timestamptz with server defaults
+
+Revision ID: 5b1e9c2d7a40
+Revises: 27fc98fb05ab
+Create Date: 2025-11-12 09:14:37.512904
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5b1e9c2d7a40'
+down_revision: Union[str, Sequence[str], None] = '27fc98fb05ab'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# (table, column)
+TIMESTAMP_COLUMNS = [
+    ('legal_consultations', 'created_at'),
+    ('legal_consultations', 'updated_at'),
+    ('chat_messages', 'created_at'),
+]
+
+
+def _columns_of_type(type_):
+    """Yield the existing timestamp columns currently stored as ``type_``."""
+    inspector = sa.inspect(op.get_bind())
+    tables = set(inspector.get_table_names())
+    for table, column in TIMESTAMP_COLUMNS:
+        # Fresh databases get the new column types from create_all
+        if table not in tables:
+            continue
+        columns = {c['name']: c for c in inspector.get_columns(table)}
+        if column in columns and isinstance(columns[column]['type'], type_):
+            yield table, column
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    for table, column in list(_columns_of_type(sa.String)):
+        # Legacy values are naive ISO strings written with utcnow()
+        op.alter_column(
+            table,
+            column,
+            type_=sa.DateTime(timezone=True),
+            existing_nullable=True,
+            server_default=sa.func.now(),
+            postgresql_using=f"(NULLIF({column}, '')::timestamp AT TIME ZONE 'UTC')",
+        )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table, column in list(_columns_of_type(sa.DateTime)):
+        op.alter_column(
+            table,
+            column,
+            type_=sa.String(),
+            existing_nullable=True,
+            server_default=None,
+            postgresql_using=f"to_char({column} AT TIME ZONE 'UTC', 'YYYY-MM-DD\"T\"HH24:MI:SS.US')",
+        )
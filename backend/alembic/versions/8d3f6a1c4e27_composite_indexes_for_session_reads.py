@@ -0,0 +1,61 @@
+"""composite indexes for session listing and message history
+
+Revision ID: 8d3f6a1c4e27
+Revises: 5b1e9c2d7a40
+Create Date: 2025-11-12 11:02:18.330417
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8d3f6a1c4e27'
+down_revision: Union[str, Sequence[str], None] = '5b1e9c2d7a40'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _existing_indexes(table):
+    """Index names on ``table``, or None if the table does not exist yet."""
+    inspector = sa.inspect(op.get_bind())
+    if table not in inspector.get_table_names():
+        return None
+    return {index['name'] for index in inspector.get_indexes(table)}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Fresh databases get these indexes from create_all
+    consultation_indexes = _existing_indexes('legal_consultations')
+    if consultation_indexes is not None:
+        if 'ix_legal_consultations_user_updated' not in consultation_indexes:
+            op.create_index(
+                'ix_legal_consultations_user_updated',
+                'legal_consultations',
+                ['user_id', sa.text('updated_at DESC')],
+            )
+        # Covered by the leading column of the composite index
+        if 'ix_legal_consultations_user_id' in consultation_indexes:
+            op.drop_index('ix_legal_consultations_user_id', table_name='legal_consultations')
+
+    message_indexes = _existing_indexes('chat_messages')
+    if message_indexes is not None:
+        if 'ix_chat_messages_session_id_id' not in message_indexes:
+            op.create_index(
+                'ix_chat_messages_session_id_id',
+                'chat_messages',
+                ['session_id', 'id'],
+            )
+        if 'ix_chat_messages_session_id' in message_indexes:
+            op.drop_index('ix_chat_messages_session_id', table_name='chat_messages')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.create_index('ix_chat_messages_session_id', 'chat_messages', ['session_id'])
+    op.drop_index('ix_chat_messages_session_id_id', table_name='chat_messages')
+    op.create_index('ix_legal_consultations_user_id', 'legal_consultations', ['user_id'])
+    op.drop_index('ix_legal_consultations_user_updated', table_name='legal_consultations')
@@ -0,0 +1,49 @@
+"""store a message count on each consultation
+
+Revision ID: c41a7e92b5d8
+Revises: 8d3f6a1c4e27
+Create Date: 2025-11-13 10:21:44.905316
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c41a7e92b5d8'
+down_revision: Union[str, Sequence[str], None] = '8d3f6a1c4e27'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _has_message_count():
+    """True/False for the column, or None if the table does not exist yet."""
+    inspector = sa.inspect(op.get_bind())
+    if 'legal_consultations' not in inspector.get_table_names():
+        return None
+    return 'message_count' in {c['name'] for c in inspector.get_columns('legal_consultations')}
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Fresh databases get the column from create_all
+    if _has_message_count() is not False:
+        return
+    op.add_column(
+        'legal_consultations',
+        sa.Column('message_count', sa.Integer(), nullable=False, server_default='0'),
+    )
+    # Backfill from the existing messages
+    op.execute(
+        "UPDATE legal_consultations SET message_count = counts.n "
+        "FROM (SELECT session_id, COUNT(*) AS n FROM chat_messages GROUP BY session_id) AS counts "
+        "WHERE legal_consultations.id = counts.session_id"
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if _has_message_count():
+        op.drop_column('legal_consultations', 'message_count')
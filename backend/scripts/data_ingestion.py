@@ -331,7 +331,8 @@ def main(refresh: bool, specific_file: str = None):
                 # Prepare data for insertion
                 data_to_insert = [
                     {
-                        "content": chunk['text'], 
+                        # Stored stripped so retrieval can use it verbatim in prompts
+                        "content": chunk['text'].strip(), 
                         "file_path": file_key, 
                         "display_page_number": chunk['page'],
                         "vector": emb
@@ -1,7 +1,10 @@
 import logging
+from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Dict, Optional, Tuple
 import time
+import secrets
+import threading
 from fastapi import APIRouter, Depends, HTTPException, status, Request
 from fastapi.security import OAuth2PasswordBearer, OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
@@ -11,7 +14,8 @@ import os
 
 from mamaope_legal.core.database import get_db
 from mamaope_legal.core.config import get_config
-from mamaope_legal.core.response_utils import create_success_response, create_error_response, ResponseTimer
+from mamaope_legal.core.constants import MAX_CACHE_SIZE, USER_CACHE_TTL_SECONDS
+from mamaope_legal.core.response_utils import create_success_response, create_error_response, utc_timestamp, ResponseTimer
 from mamaope_legal.models.user import User
 from mamaope_legal.schemas import UserCreate, UserResponse, UserUpdate, Token, LoginRequest, StandardResponse, SuccessResponse, EmailVerificationRequest, ResendVerificationRequest
 
@@ -32,6 +36,36 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 router = APIRouter()
 
 
+@dataclass(frozen=True)
+class AuthenticatedUser:
+    """Detached snapshot of an authenticated user, safe to reuse across requests."""
+    id: int
+    username: str
+    email: str
+    full_name: Optional[str]
+    role: str
+    is_active: bool
+    is_email_verified: bool
+
+
+# Short-lived per-process cache of authenticated users keyed by (sub, exp)
+# Sync endpoints run in the threadpool, so every read, write and eviction takes the lock
+_USER_CACHE: Dict[Tuple[str, Optional[int]], Tuple[AuthenticatedUser, float]] = {}
+_USER_CACHE_LOCK = threading.Lock()
+
+
+def invalidate_user_cache(username: str) -> None:
+    """Drop cached entries for a user after their account data changes."""
+    with _USER_CACHE_LOCK:
+        for key in [k for k in _USER_CACHE if k[0] == username]:
+            del _USER_CACHE[key]
+
+
+def generate_username(first_name: str, last_name: str) -> str:
+    """Build a unique username from a name pair and a hex nanosecond timestamp."""
+    return f"{first_name.lower()}.{last_name.lower()}.{time.time_ns():x}"
+
+
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash."""
     try:
@@ -80,8 +114,12 @@ def get_user_by_email(db: Session, email: str):
     return db.query(User).filter(User.email == email).first()
 
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    """Get current authenticated user."""
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)) -> AuthenticatedUser:
+    """Get current authenticated user.
+    
+    The resolved user is cached for USER_CACHE_TTL_SECONDS (kept well below the
+    access-token lifetime) so bursts of authenticated requests skip the users SELECT.
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -96,11 +134,33 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     except jwt.JWTError:
         raise credentials_exception
     
+    cache_key = (username, payload.get("exp"))
+    now = time.monotonic()
+    with _USER_CACHE_LOCK:
+        cached = _USER_CACHE.get(cache_key)
+    if cached and now - cached[1] < USER_CACHE_TTL_SECONDS:
+        return cached[0]
+    
     user = db.query(User).filter(User.username == username).first()
     if user is None:
         raise credentials_exception
     
-    return user
+    snapshot = AuthenticatedUser(
+        id=user.id,
+        username=user.username,
+        email=user.email,
+        full_name=user.full_name,
+        role=user.role,
+        is_active=user.is_active,
+        is_email_verified=user.is_email_verified
+    )
+    with _USER_CACHE_LOCK:
+        _USER_CACHE[cache_key] = (snapshot, now)
+        if len(_USER_CACHE) > MAX_CACHE_SIZE:
+            # Drop the oldest entry (dicts keep insertion order)
+            del _USER_CACHE[next(iter(_USER_CACHE))]
+    
+    return snapshot
 
 
 def get_current_user_safe(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
@@ -151,7 +211,7 @@ def get_current_user_safe_v1(request: Request, db: Session = Depends(get_db)):
     return user
 
 
-def require_admin_role(current_user: User = Depends(get_current_user)):
+def require_admin_role(current_user: AuthenticatedUser = Depends(get_current_user)):
     """Require admin or super_admin role."""
     if current_user.role not in ["admin", "super_admin"]:
         raise HTTPException(
@@ -161,7 +221,7 @@ def require_admin_role(current_user: User = Depends(get_current_user)):
     return current_user
 
 
-def require_super_admin_role(current_user: User = Depends(get_current_user)):
+def require_super_admin_role(current_user: AuthenticatedUser = Depends(get_current_user)):
     """Require super_admin role."""
     if current_user.role != "super_admin":
         raise HTTPException(
@@ -171,7 +231,7 @@ def require_super_admin_role(current_user: User = Depends(get_current_user)):
     return current_user
 
 
-def require_user_role(current_user: User = Depends(get_current_user)):
+def require_user_role(current_user: AuthenticatedUser = Depends(get_current_user)) -> AuthenticatedUser:
     """Require any authenticated user role."""
     return current_user
 
@@ -191,8 +251,6 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
                     execution_time=timer.get_execution_time()
                 )
             
-            # Username and full_name are now generated in the schema's model_post_init method
-            
             # Check if email already exists
             if get_user_by_email(db, user.email):
                 return create_error_response(
@@ -211,6 +269,12 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
                     execution_time=timer.get_execution_time()
                 )
             
+            # Derive username/full_name only once the request has passed the prechecks
+            username = user.username or generate_username(user.first_name, user.last_name)
+            full_name = user.full_name
+            if not full_name and user.first_name and user.last_name:
+                full_name = f"{user.first_name} {user.last_name}"
+            
             hashed_password = get_password_hash(user.password)
             
             # Generate email verification token
@@ -218,22 +282,20 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
                 verification_token = email_service.generate_verification_token()
             else:
                 # Fallback: generate a simple token if email service is not available
-                import secrets
-                import string
-                alphabet = string.ascii_letters + string.digits
-                verification_token = ''.join(secrets.choice(alphabet) for _ in range(32))
+                verification_token = secrets.token_urlsafe(24)
             
+            now = utc_timestamp(timespec="seconds")
             new_user = User(
-                username=user.username,
-                full_name=user.full_name,
+                username=username,
+                full_name=full_name,
                 email=user.email,
                 hashed_password=hashed_password,
                 is_active=True,
                 is_email_verified=True,  # Auto-verify users since email service is not configured
                 email_verification_token=verification_token,
                 role=user_role,
-                created_at=datetime.utcnow().isoformat(),
-                updated_at=datetime.utcnow().isoformat()
+                created_at=now,
+                updated_at=now
             )
             
             db.add(new_user)
@@ -245,7 +307,7 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
             if email_service:
                 email_sent = email_service.send_verification_email(
                     email=user.email,
-                    username=user.username,
+                    username=username,
                     verification_token=verification_token
                 )
             
@@ -407,8 +469,9 @@ def verify_email(token: str, db: Session = Depends(get_db)):
             # Verify email
             user.is_email_verified = True
             user.email_verification_token = None  # Clear the token
-            user.updated_at = datetime.utcnow().isoformat()
+            user.updated_at = utc_timestamp(timespec="seconds")
             db.commit()
+            invalidate_user_cache(user.username)
             
             return create_success_response(
                 data={"message": "Email verified successfully"},
@@ -459,13 +522,10 @@ def resend_verification_email(resend_data: ResendVerificationRequest, db: Sessio
                 verification_token = email_service.generate_verification_token()
             else:
                 # Fallback: generate a simple token if email service is not available
-                import secrets
-                import string
-                alphabet = string.ascii_letters + string.digits
-                verification_token = ''.join(secrets.choice(alphabet) for _ in range(32))
+                verification_token = secrets.token_urlsafe(24)
             
             user.email_verification_token = verification_token
-            user.updated_at = datetime.utcnow().isoformat()
+            user.updated_at = utc_timestamp(timespec="seconds")
             db.commit()
             
             # Send verification email
@@ -527,8 +587,9 @@ def manual_verify_email(email: str, db: Session = Depends(get_db)):
             # Manually verify email
             user.is_email_verified = True
             user.email_verification_token = None
-            user.updated_at = datetime.utcnow().isoformat()
+            user.updated_at = utc_timestamp(timespec="seconds")
             db.commit()
+            invalidate_user_cache(user.username)
             
             return create_success_response(
                 data={"message": f"Email {email} manually verified for development"},
@@ -626,7 +687,7 @@ def get_all_users(
     skip: int = 0,
     limit: int = 100,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: AuthenticatedUser = Depends(get_current_user)
 ):
     """Get all users (admin only)."""
     with ResponseTimer() as timer:
@@ -678,7 +739,7 @@ def update_user(
     user_id: int,
     user_update: UserUpdate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: AuthenticatedUser = Depends(get_current_user)
 ):
     """Update user (admin only)."""
     with ResponseTimer() as timer:
@@ -709,13 +770,15 @@ def update_user(
                     )
             
             # Update fields
+            previous_username = user.username
             update_data = user_update.dict(exclude_unset=True)
             for field, value in update_data.items():
                 setattr(user, field, value)
             
-            user.updated_at = datetime.utcnow().isoformat()
+            user.updated_at = utc_timestamp(timespec="seconds")
             db.commit()
             db.refresh(user)
+            invalidate_user_cache(previous_username)
             
             user_response = UserResponse(
                 id=user.id,
@@ -1,3 +1,4 @@
+import asyncio
 import logging
 from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException, Query
@@ -5,14 +6,13 @@ from sqlalchemy.orm import Session
 
 from mamaope_legal.core.database import get_db
 from mamaope_legal.core.response_utils import create_success_response, create_error_response, ResponseTimer
-from mamaope_legal.models.user import User
 from mamaope_legal.schemas import (
     ChatSessionCreate, ChatSessionUpdate, ChatSessionResponse, 
     ChatMessageCreate, ChatMessageResponse, ChatSessionWithMessages,
     ChatSessionListResponse, StandardResponse
 )
 from mamaope_legal.services.legal_consultation_service import LegalConsultationService
-from mamaope_legal.api.v1.auth import require_user_role
+from mamaope_legal.api.v1.auth import AuthenticatedUser, require_user_role
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -21,14 +21,14 @@ router = APIRouter()
 @router.post("/sessions", response_model=StandardResponse, status_code=201)
 async def create_chat_session(
     session_data: ChatSessionCreate,
-    current_user: User = Depends(require_user_role),
+    current_user: AuthenticatedUser = Depends(require_user_role),
     db: Session = Depends(get_db)
 ):
     """Create a new chat session."""
     with ResponseTimer() as timer:
         try:
             service = LegalConsultationService(db)
-            session = service.create_session(current_user, session_data)
+            session = await asyncio.to_thread(service.create_session, current_user, session_data)
             
             return create_success_response(
                 data=session,
@@ -50,14 +50,14 @@ async def create_chat_session(
 async def list_chat_sessions(
     page: int = Query(1, ge=1, description="Page number"),
     per_page: int = Query(20, ge=1, le=100, description="Items per page"),
-    current_user: User = Depends(require_user_role),
+    current_user: AuthenticatedUser = Depends(require_user_role),
     db: Session = Depends(get_db)
 ):
     """List chat sessions for the current user."""
     with ResponseTimer() as timer:
         try:
             service = LegalConsultationService(db)
-            sessions = service.list_sessions(current_user, page, per_page)
+            sessions = await asyncio.to_thread(service.list_sessions, current_user, page, per_page)
             
             return create_success_response(
                 data=sessions,
@@ -77,21 +77,17 @@ async def list_chat_sessions(
 @router.get("/sessions/{session_id}", response_model=StandardResponse)
 async def get_chat_session(
     session_id: int,
-    current_user: User = Depends(require_user_role),
+    current_user: AuthenticatedUser = Depends(require_user_role),
     db: Session = Depends(get_db)
 ):
     """Get a specific chat session."""
     with ResponseTimer() as timer:
         try:
             service = LegalConsultationService(db)
-            session = service.get_session(session_id, current_user)
+            session = await asyncio.to_thread(service.get_session, session_id, current_user)
             
             if not session:
-                return create_error_response(
-                    message="Chat session not found",
-                    status_code=404,
-                    execution_time=timer.get_execution_time()
-                )
+                raise HTTPException(status_code=404, detail="Chat session not found")
             
             return create_success_response(
                 data=session,
@@ -99,6 +95,8 @@ async def get_chat_session(
                 execution_time=timer.get_execution_time()
             )
             
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Error getting chat session {session_id}: {e}")
             return create_error_response(
@@ -111,21 +109,17 @@ async def get_chat_session(
 @router.get("/sessions/{session_id}/messages", response_model=StandardResponse)
 async def get_chat_session_with_messages(
     session_id: int,
-    current_user: User = Depends(require_user_role),
+    current_user: AuthenticatedUser = Depends(require_user_role),
     db: Session = Depends(get_db)
 ):
     """Get a chat session with all its messages."""
     with ResponseTimer() as timer:
         try:
             service = LegalConsultationService(db)
-            session = service.get_session_with_messages(session_id, current_user)
+            session = await asyncio.to_thread(service.get_session_with_messages, session_id, current_user)
             
             if not session:
-                return create_error_response(
-                    message="Chat session not found",
-                    status_code=404,
-                    execution_time=timer.get_execution_time()
-                )
+                raise HTTPException(status_code=404, detail="Chat session not found")
             
             return create_success_response(
                 data=session,
@@ -133,6 +127,8 @@ async def get_chat_session_with_messages(
                 execution_time=timer.get_execution_time()
             )
             
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Error getting chat session with messages {session_id}: {e}")
             return create_error_response(
@@ -146,21 +142,17 @@ async def get_chat_session_with_messages(
 async def update_chat_session(
     session_id: int,
     update_data: ChatSessionUpdate,
-    current_user: User = Depends(require_user_role),
+    current_user: AuthenticatedUser = Depends(require_user_role),
     db: Session = Depends(get_db)
 ):
     """Update a chat session."""
     with ResponseTimer() as timer:
         try:
             service = LegalConsultationService(db)
-            session = service.update_session(session_id, current_user, update_data)
+            session = await asyncio.to_thread(service.update_session, session_id, current_user, update_data)
             
             if not session:
-                return create_error_response(
-                    message="Chat session not found",
-                    status_code=404,
-                    execution_time=timer.get_execution_time()
-                )
+                raise HTTPException(status_code=404, detail="Chat session not found")
             
             return create_success_response(
                 data=session,
@@ -169,6 +161,8 @@ async def update_chat_session(
                 execution_time=timer.get_execution_time()
             )
             
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Error updating chat session {session_id}: {e}")
             return create_error_response(
@@ -181,21 +175,17 @@ async def update_chat_session(
 @router.delete("/sessions/{session_id}", response_model=StandardResponse)
 async def delete_chat_session(
     session_id: int,
-    current_user: User = Depends(require_user_role),
+    current_user: AuthenticatedUser = Depends(require_user_role),
     db: Session = Depends(get_db)
 ):
     """Delete a chat session."""
     with ResponseTimer() as timer:
         try:
             service = LegalConsultationService(db)
-            deleted = service.delete_session(session_id, current_user)
+            deleted = await asyncio.to_thread(service.delete_session, session_id, current_user)
             
             if not deleted:
-                return create_error_response(
-                    message="Chat session not found",
-                    status_code=404,
-                    execution_time=timer.get_execution_time()
-                )
+                raise HTTPException(status_code=404, detail="Chat session not found")
             
             return create_success_response(
                 data={"deleted": True},
@@ -204,6 +194,8 @@ async def delete_chat_session(
                 execution_time=timer.get_execution_time()
             )
             
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Error deleting chat session {session_id}: {e}")
             return create_error_response(
@@ -217,21 +209,17 @@ async def delete_chat_session(
 async def add_message_to_session(
     session_id: int,
     message_data: ChatMessageCreate,
-    current_user: User = Depends(require_user_role),
+    current_user: AuthenticatedUser = Depends(require_user_role),
     db: Session = Depends(get_db)
 ):
     """Add a message to a chat session."""
     with ResponseTimer() as timer:
         try:
             service = LegalConsultationService(db)
-            message = service.add_message(session_id, current_user, message_data)
+            message = await asyncio.to_thread(service.add_message, session_id, current_user, message_data)
             
             if not message:
-                return create_error_response(
-                    message="Chat session not found",
-                    status_code=404,
-                    execution_time=timer.get_execution_time()
-                )
+                raise HTTPException(status_code=404, detail="Chat session not found")
             
             return create_success_response(
                 data=message,
@@ -240,6 +228,8 @@ async def add_message_to_session(
                 execution_time=timer.get_execution_time()
             )
             
+        except HTTPException:
+            raise
         except Exception as e:
             logger.error(f"Error adding message to session {session_id}: {e}")
             return create_error_response(
@@ -252,14 +242,14 @@ async def add_message_to_session(
 @router.get("/sessions/{session_id}/history", response_model=StandardResponse)
 async def get_chat_history(
     session_id: int,
-    current_user: User = Depends(require_user_role),
+    current_user: AuthenticatedUser = Depends(require_user_role),
     db: Session = Depends(get_db)
 ):
     """Get formatted chat history for a session."""
     with ResponseTimer() as timer:
         try:
             service = LegalConsultationService(db)
-            chat_history = service.get_chat_history(session_id, current_user)
+            chat_history = await asyncio.to_thread(service.get_chat_history, session_id, current_user)
             
             return create_success_response(
                 data={"chat_history": chat_history},
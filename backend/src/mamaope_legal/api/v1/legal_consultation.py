@@ -1,16 +1,19 @@
+import asyncio
 import logging
-import json
+import orjson
 from datetime import datetime
-from fastapi import APIRouter, HTTPException, Depends
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.exceptions import RequestValidationError
 from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
 from sqlalchemy.orm import Session
-from mamaope_legal.core.database import get_db
+from mamaope_legal.core.database import SessionLocal, get_db, get_pool_status
 from mamaope_legal.core.response_utils import create_success_response, create_error_response, ResponseTimer
-from mamaope_legal.models.user import User
-from mamaope_legal.schemas import LegalQueryInput, LegalQueryResponse, StandardResponse, SuccessResponse, ChatMessageCreate
-from mamaope_legal.services.conversational_service import generate_response
+from mamaope_legal.schemas import LEGAL_QUERY_INPUT_ADAPTER, LegalQueryInput, LegalQueryResponse, StandardResponse, SuccessResponse, ChatMessageCreate, ChatSessionCreate
+from mamaope_legal.services.conversational_service import generate_response, genai_circuit, stream_response
 from mamaope_legal.services.legal_consultation_service import LegalConsultationService
-from mamaope_legal.api.v1.auth import require_user_role
+from mamaope_legal.services.semantic_cache import semantic_cache
+from mamaope_legal.api.v1.auth import AuthenticatedUser, require_user_role
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
@@ -28,21 +31,25 @@ async def legal_consultation_health():
             test_response, _, _ = await generate_response(
                 query="test",
                 chat_history="",
-                patient_data="test patient data"
+                case_data="test case data"
             )
             
             if test_response and len(test_response.strip()) > 0:
                 health_data = {
                     "status": "healthy",
                     "ai_service": "available",
-                    "message": "Legal consultation service is operational"
+                    "message": "Legal consultation service is operational",
+                    "semantic_cache": semantic_cache.stats(),
+                    "genai_circuit": genai_circuit.state(),
+                    "db_pool": get_pool_status()
                 }
                 
                 return create_success_response(
                     data=health_data,
                     status_code=200,
                     message="Legal consultation service is healthy",
-                    execution_time=timer.get_execution_time()
+                    execution_time=timer.get_execution_time(),
+                    additional_details=health_data
                 )
             else:
                 return create_error_response(
@@ -65,8 +72,27 @@ async def legal_consultation_health():
             )
 
 
-@router.post("/analyze", response_model=StandardResponse)
-async def analyze_case(data: LegalQueryInput, current_user: User = Depends(require_user_role), db: Session = Depends(get_db)):
+async def _parse_legal_query(request: Request) -> LegalQueryInput:
+    """Validate the raw JSON body with the prebuilt adapter (no intermediate dict)."""
+    try:
+        return LEGAL_QUERY_INPUT_ADAPTER.validate_json(await request.body())
+    except ValidationError as e:
+        raise RequestValidationError(
+            [{**error, "loc": ("body", *error["loc"])} for error in e.errors(include_url=False)]
+        )
+
+
+@router.post(
+    "/analyze",
+    response_model=StandardResponse,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {"application/json": {"schema": LEGAL_QUERY_INPUT_ADAPTER.json_schema()}},
+        }
+    },
+)
+async def analyze_case(data: LegalQueryInput = Depends(_parse_legal_query), current_user: AuthenticatedUser = Depends(require_user_role), db: Session = Depends(get_db)):
     """
     Generate AI-powered legal analysis based on case data.
     Requires authentication - only logged-in users can access this endpoint.
@@ -94,19 +120,21 @@ async def analyze_case(data: LegalQueryInput, current_user: User = Depends(requi
             
             if session_id:
                 try:
-                    chat_history = session_service.get_chat_history(session_id, current_user)
+                    chat_history = await asyncio.to_thread(session_service.get_chat_history, session_id, current_user)
                 except Exception as e:
                     logger.warning(f"Could not get chat history from session {session_id}: {e}")
                     # Continue with provided chat_history
             else:
                 # Auto-create a new session if none provided
                 try:
-                    from mamaope_legal.schemas import ChatSessionCreate
+                    ts = datetime.utcnow().isoformat(timespec='minutes')
+                    case_data = data.case_data
+                    summary = case_data if len(case_data) <= 200 else case_data[:200] + "…"
                     new_session_data = ChatSessionCreate(
-                        session_name=f"Legal Consultation - {datetime.utcnow().strftime('%Y-%m-%d %H:%M')}",
-                        case_summary=data.case_data[:200] + "..." if len(data.case_data) > 200 else data.case_data
+                        session_name=f"Legal Consultation - {ts}",
+                        case_summary=summary
                     )
-                    new_session = session_service.create_session(current_user, new_session_data)
+                    new_session = await asyncio.to_thread(session_service.create_session, current_user, new_session_data)
                     session_id = new_session.id
                     logger.info(f"Auto-created new case session {session_id} for user {current_user.id}")
                 except Exception as e:
@@ -139,27 +167,25 @@ async def analyze_case(data: LegalQueryInput, current_user: User = Depends(requi
                     execution_time=timer.get_execution_time()
                 )
 
-            # Store messages in session (session should exist now)
+            # Store the exchange only once there is a valid answer, both messages in one transaction
             if session_id:
                 try:
-                    # Add user message
                     user_message = ChatMessageCreate(
                         content=data.case_data,
                         message_type="user",
                         case_data=data.case_data,
                         analysis_complete=False
                     )
-                    session_service.add_message(session_id, current_user, user_message)
-                    
-                    # Add AI response message
                     ai_message = ChatMessageCreate(
                         content=response,
                         message_type="assistant",
                         case_data=data.case_data,
                         analysis_complete=analysis_complete
                     )
-                    ai_msg_response = session_service.add_message(session_id, current_user, ai_message)
-                    message_id = ai_msg_response.id if ai_msg_response else None
+                    stored = await asyncio.to_thread(
+                        session_service.add_messages, session_id, current_user, [user_message, ai_message]
+                    )
+                    message_id = stored[-1].id if stored else None
                     
                     logger.info(f"Stored messages in session {session_id}, message_id: {message_id}")
                     
@@ -205,3 +231,93 @@ async def analyze_case(data: LegalQueryInput, current_user: User = Depends(requi
                 status_code=500,
                 execution_time=timer.get_execution_time()
             )
+
+
+def _sse(event: str, payload: dict) -> bytes:
+    """Encode one server-sent event."""
+    return b"event: " + event.encode() + b"\ndata: " + orjson.dumps(payload) + b"\n\n"
+
+
+@router.post(
+    "/analyze/stream",
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "content": {"application/json": {"schema": LEGAL_QUERY_INPUT_ADAPTER.json_schema()}},
+        }
+    },
+)
+async def analyze_case_stream(data: LegalQueryInput = Depends(_parse_legal_query), current_user: AuthenticatedUser = Depends(require_user_role)):
+    """
+    Stream AI-powered legal analysis as server-sent events.
+
+    Emits a ``sources`` event, then ``delta`` events with response text as it is
+    generated, then a ``done`` event with the session and message ids (or an
+    ``error`` event). Messages are stored in the session once the answer is complete.
+    """
+    if not data.case_data or len(data.case_data.strip()) < 10:
+        return create_error_response(
+            message="Case data must be at least 10 characters long",
+            status_code=400
+        )
+
+    logger.info(f"Streaming legal analysis request from user: {current_user.username} (role: {current_user.role})")
+
+    async def event_stream():
+        # The body is sent after the request's dependencies and session scope
+        # have closed, so the stream owns a private session outside the scoped
+        # registry (the generator may be finalized in another context).
+        db = SessionLocal.session_factory()
+        try:
+            session_service = LegalConsultationService(db)
+            chat_history = data.chat_history or ""
+            session_id = data.session_id
+
+            if session_id:
+                try:
+                    chat_history = await asyncio.to_thread(session_service.get_chat_history, session_id, current_user)
+                except Exception as e:
+                    logger.warning(f"Could not get chat history from session {session_id}: {e}")
+
+            parts = []
+            try:
+                sources, chunks = await stream_response(
+                    query=data.case_data,
+                    chat_history=chat_history,
+                    case_data=data.case_data
+                )
+                yield _sse("sources", {"sources": sources})
+                async for chunk in chunks:
+                    parts.append(chunk)
+                    yield _sse("delta", {"text": chunk})
+            except Exception as e:
+                logger.error(f"AI streaming error: {str(e)}")
+                yield _sse("error", {"message": "AI service temporarily unavailable"})
+                return
+
+            response = "".join(parts).strip()
+            message_id = None
+            if session_id and response:
+                try:
+                    stored = await asyncio.to_thread(
+                        session_service.add_messages, session_id, current_user,
+                        [
+                            ChatMessageCreate(content=data.case_data, message_type="user", case_data=data.case_data, analysis_complete=False),
+                            ChatMessageCreate(content=response, message_type="assistant", case_data=data.case_data, analysis_complete=True)
+                        ]
+                    )
+                    message_id = stored[-1].id if stored else None
+                except Exception as e:
+                    logger.warning(f"Could not store messages in session {session_id}: {e}")
+
+            logger.info(f"Streamed legal analysis completed. Response length: {len(response)} characters")
+            yield _sse("done", {"session_id": session_id, "message_id": message_id})
+        finally:
+            db.close()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        # Content-Encoding keeps GZipMiddleware from buffering the stream
+        headers={"Cache-Control": "no-cache", "Content-Encoding": "identity", "X-Accel-Buffering": "no"},
+    )
@@ -7,14 +7,12 @@ standards with proper environment variable handling and validation.
 
 import os
 import logging
+from functools import lru_cache
 from typing import Optional, List, Dict, Any
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from pydantic import field_validator, Field
 from dotenv import load_dotenv
 
-# Load environment variables
-load_dotenv()
-
 logger = logging.getLogger(__name__)
 
 
@@ -28,10 +26,14 @@ class DatabaseConfig(BaseSettings):
     db_port: int = Field(default=5432, env="DB_PORT")
     db_name: str = Field(..., env="DB_NAME")
     
-    # Connection pool settings
-    db_pool_size: int = Field(default=10, env="DB_POOL_SIZE")
-    db_max_overflow: int = Field(default=20, env="DB_MAX_OVERFLOW")
+    # Connection pool settings (defaults scale with available CPUs)
+    db_pool_size: int = Field(default_factory=lambda: max(5, (os.cpu_count() or 1) * 2), env="DB_POOL_SIZE")
+    db_max_overflow: Optional[int] = Field(default=None, env="DB_MAX_OVERFLOW")
     db_pool_timeout: int = Field(default=30, env="DB_POOL_TIMEOUT")
+    db_pool_recycle: int = Field(default=1800, env="DB_POOL_RECYCLE")
+    
+    # Compiled SQL statement cache entries per engine
+    db_query_cache_size: int = Field(default=2000, env="DB_QUERY_CACHE_SIZE")
     
     @field_validator('db_password')
     @classmethod
@@ -49,6 +51,13 @@ class DatabaseConfig(BaseSettings):
             raise ValueError('Database port must be between 1 and 65535')
         return v
     
+    @property
+    def effective_max_overflow(self) -> int:
+        """Max overflow connections, defaulting to twice the pool size."""
+        if self.db_max_overflow is None:
+            return self.db_pool_size * 2
+        return self.db_max_overflow
+    
     @property
     def database_url(self) -> str:
         """Get database URL."""
@@ -105,6 +114,11 @@ class ApplicationConfig(BaseSettings):
     api_host: str = Field(default="0.0.0.0", env="API_HOST")
     api_port: int = Field(default=8050, env="API_PORT")
     
+    # CORS: explicit origins let the middleware use a static allow-origin header
+    cors_origins: List[str] = Field(
+        default=["http://localhost:3000", "http://localhost:8080"], env="CORS_ORIGINS"
+    )
+    
     # Data limits
     max_patient_data_length: int = Field(default=10000, env="MAX_PATIENT_DATA_LENGTH")
     max_chat_history_length: int = Field(default=50000, env="MAX_CHAT_HISTORY_LENGTH")
@@ -155,10 +169,8 @@ class Config:
         return self.application.environment == 'development'
 
 
-# Global configuration instance
-config = Config()
-
-
+@lru_cache(maxsize=1)
 def get_config() -> Config:
-    """Get the global configuration instance."""
-    return config
+    """Get the global configuration instance, built lazily on first use."""
+    load_dotenv()
+    return Config()
@@ -9,6 +9,17 @@ PROMPT_TOKEN_LIMIT = 16000
 # Cache Configuration
 CACHE_TTL_MINUTES = 60 
 MAX_CACHE_SIZE = 500  
+CACHE_EVICTION_SAMPLE_SIZE = 5  # LRU-end entries weighed by hit count on eviction
+USER_CACHE_TTL_SECONDS = 30
+CACHE_SWEEP_INTERVAL_SECONDS = 30  # Background expiry sweep for in-process caches
+
+# Semantic Cache Configuration (cosine similarity, LSH tables x bits per key)
+SEMANTIC_CACHE_THRESHOLD = 0.95
+SEMANTIC_CACHE_TABLES = 16
+SEMANTIC_CACHE_BITS = 12
+
+# Query embeddings kept in memory (float32, ~12KB each at 3072 dims)
+EMBEDDING_CACHE_SIZE = 1000
 
 # Context Optimization
 DEFAULT_CONTEXT_MAX_CHARS = 1200 
@@ -24,6 +35,13 @@ RETRY_MULTIPLIER = 1
 RETRY_MIN_WAIT = 4
 RETRY_MAX_WAIT = 10
 
+# Circuit breaker for model calls (consecutive failures before opening, seconds before a trial call)
+CIRCUIT_FAILURE_THRESHOLD = 5
+CIRCUIT_RESET_SECONDS = 30
+
+# Minimum seconds between background retries of a failed GenAI client initialization
+GENAI_INIT_RETRY_SECONDS = 30
+
 OPTIMIZED_PROMPT = """You are Mamaope Legal, an AI legal expert on Ugandan and East African law. Answer using ONLY the evidence provided.
 
 **Response Format:**
@@ -48,43 +66,3 @@ OPTIMIZED_PROMPT = """You are Mamaope Legal, an AI legal expert on Ugandan and E
 **Sources:** {sources}
 **Evidence:** {context}
 """
-
-PROMPT = """
-You are **Mamaope Legal**, an AI legal expert on Ugandan and East African law.  
-Answer clearly and professionally using **only** the verified evidence provided.  
-If something is missing, say: “I could not find specific information about this in the evidence.”
-
----
-
-### OBJECTIVE
-Provide accurate, concise, and grounded legal explanations in a natural, authoritative tone.
-
----
-
-### RESPONSE STRUCTURE
-1. **Overview (2–3 sentences):** Directly answer the question.  
-2. **Legal Basis:** Cite and explain relevant articles or cases from the evidence.  
-3. **Application (optional):** Describe how the rule works in real life.  
-4. **References:** List cited sources.
-
----
-
-### STYLE
-- Formal but easy to understand.  
-- Cite laws naturally: “Under Article 50(1)…”  
-- Be factual, never speculative or advisory.  
-- Use full sentences, not bullets (unless summarizing).  
-
----
-
-### WHAT NOT TO DO
-- Don’t invent or guess legal information.  
-- Don’t use external knowledge.  
-- Don’t repeat the question verbatim.  
-
----
-
-**Available Sources:** {sources}  
-**Evidence Base:**  
-{context}
-"""
\ No newline at end of file
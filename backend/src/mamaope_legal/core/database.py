@@ -5,10 +5,15 @@ This module provides secure database operations with proper connection managemen
 transaction handling, and audit logging following medical software standards.
 """
 
+import itertools
 import logging
+import threading
+from contextvars import ContextVar
+from functools import lru_cache
 from typing import Generator, Optional
 from sqlalchemy import create_engine, event, text
-from sqlalchemy.orm import sessionmaker, Session
+from sqlalchemy.engine import make_url
+from sqlalchemy.orm import scoped_session, sessionmaker, Session
 from sqlalchemy.pool import QueuePool
 from sqlalchemy.exc import SQLAlchemyError, IntegrityError
 from contextlib import contextmanager
@@ -18,21 +23,67 @@ from mamaope_legal.core.config import get_config
 config = get_config()
 logger = logging.getLogger(__name__)
 
+# Dialect resolved once from the URL rather than inspecting each DBAPI connection
+_DATABASE_URL = config.get_database_url()
+_IS_PG = make_url(_DATABASE_URL).get_backend_name() == "postgresql"
+
+# Application-wide pg advisory lock id guarding schema creation
+DDL_ADVISORY_LOCK_KEY = 7_240_511
+
 # Database engine with enhanced security settings
 engine = create_engine(
-    config.get_database_url(),
+    _DATABASE_URL,
     poolclass=QueuePool,
     pool_size=config.database.db_pool_size,
-    max_overflow=config.database.db_max_overflow,
+    max_overflow=config.database.effective_max_overflow,
     pool_timeout=config.database.db_pool_timeout,
+    pool_use_lifo=True,  # Reuse the most recently returned connection first
     pool_pre_ping=True,  # Verify connections before use
-    pool_recycle=3600,   # Recycle connections every hour
-    echo=config.application.debug,  # Log SQL queries in debug mode
-    echo_pool=config.application.debug,  # Log pool events in debug mode
+    pool_recycle=config.database.db_pool_recycle,  # Recycle before server/proxy idle cutoffs
+    query_cache_size=config.database.db_query_cache_size,  # Compiled SQL cache
+    # Rows per multi-row INSERT ... RETURNING when ORM flushes many objects
+    # (e.g. a batch of ChatMessage rows) instead of one statement per row
+    insertmanyvalues_page_size=1000,
+    # Session timeouts applied by libpq at connect time (no extra SET round trips):
+    # statement timeout 5 minutes, idle-in-transaction timeout 10 minutes
+    connect_args={
+        "options": "-c statement_timeout=300s -c idle_in_transaction_session_timeout=600s"
+    } if _IS_PG else {},
 )
 
-# Session factory
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+# Per-request scope key, set by the HTTP middleware for the lifetime of a request
+_request_scope: ContextVar[Optional[int]] = ContextVar("db_request_scope", default=None)
+
+
+def _session_scope():
+    """Scope sessions to the current request, or to the thread outside one."""
+    scope = _request_scope.get()
+    if scope is None:
+        return ("thread", threading.get_ident())
+    return ("request", scope)
+
+
+# Session registry: every SessionLocal() within one request shares a Session
+SessionLocal = scoped_session(
+    sessionmaker(autocommit=False, autoflush=False, bind=engine),
+    scopefunc=_session_scope,
+)
+
+
+@contextmanager
+def request_session_scope(key: int):
+    """
+    Bind database sessions to a single request.
+    
+    Args:
+        key: Identifier unique to the request for its lifetime
+    """
+    token = _request_scope.set(key)
+    try:
+        yield
+    finally:
+        SessionLocal.remove()
+        _request_scope.reset(token)
 
 
 def get_db() -> Generator[Session, None, None]:
@@ -45,6 +96,7 @@ def get_db() -> Generator[Session, None, None]:
     Raises:
         SQLAlchemyError: If database connection fails
     """
+    ensure_db_ready()
     db = SessionLocal()
     try:
         yield db
@@ -92,7 +144,15 @@ def create_tables():
     try:
         # Import all models to ensure they are registered with SQLAlchemy
         from mamaope_legal.models import Base, User, LegalConsultation, ChatMessage
-        Base.metadata.create_all(bind=engine)
+        if _IS_PG:
+            # Serialize DDL across workers/pods; the lock is released on commit
+            with engine.begin() as connection:
+                connection.execute(
+                    text("SELECT pg_advisory_xact_lock(:k)"), {"k": DDL_ADVISORY_LOCK_KEY}
+                )
+                Base.metadata.create_all(bind=connection)
+        else:
+            Base.metadata.create_all(bind=engine)
         logger.info("Database tables created successfully")
     except SQLAlchemyError as e:
         logger.error(f"Failed to create database tables: {e}")
@@ -116,29 +176,41 @@ def check_database_connection() -> bool:
         return False
 
 
-# Database event listeners for additional security
-@event.listens_for(engine, "connect")
-def set_sqlite_pragma(dbapi_connection, connection_record):
-    """Set database connection parameters for security."""
-    if 'postgresql' in str(dbapi_connection):
-        # PostgreSQL specific settings
-        with dbapi_connection.cursor() as cursor:
-            # Set statement timeout (5 minutes)
-            cursor.execute("SET statement_timeout = '300s'")
-            # Set idle transaction timeout (10 minutes)
-            cursor.execute("SET idle_in_transaction_session_timeout = '600s'")
-
-
-@event.listens_for(engine, "before_cursor_execute")
-def receive_before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
-    """Log SQL queries in debug mode."""
-    if config.application.debug:
-        logger.debug(f"SQL Query: {statement}")
+# Database event listeners
+# In debug mode only every Nth statement is logged, so query throughput is
+# not bound by contention on the log handler
+SQL_LOG_SAMPLE_RATE = 100
+_statement_counter = itertools.count(1)
+
+
+if config.application.debug:
+    @event.listens_for(engine, "before_cursor_execute")
+    def receive_before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        """Log a sample of SQL queries in debug mode."""
+        if next(_statement_counter) % SQL_LOG_SAMPLE_RATE:
+            return
+        logger.debug(f"SQL Query (1/{SQL_LOG_SAMPLE_RATE} sampled): {statement}")
         if parameters:
             logger.debug(f"SQL Parameters: {parameters}")
+    
+    @event.listens_for(engine, "checkout")
+    def receive_checkout(dbapi_connection, connection_record, connection_proxy):
+        """Flag checkouts that spill into overflow, a sign the pool is undersized."""
+        if engine.pool.overflow() > 0:
+            logger.debug(f"Connection pool in overflow: {engine.pool.status()}")
+
+
+def get_pool_status() -> dict:
+    """Connection pool occupancy for health reporting."""
+    pool = engine.pool
+    return {
+        "size": pool.size(),
+        "checked_out": pool.checkedout(),
+        "overflow": pool.overflow(),
+        "idle": pool.checkedin(),
+    }
 
 
-# Initialize database on module import
 def initialize_database():
     """Initialize database connection and create tables if needed."""
     try:
@@ -156,10 +228,12 @@ def initialize_database():
         raise
 
 
-# Auto-initialize on import
-if config.application.environment != 'test':
-    try:
-        initialize_database()
-    except Exception as e:
-        logger.warning(f"Database initialization failed on import: {e}")
-        logger.info("Database will be initialized when first accessed")
+@lru_cache(maxsize=1)
+def ensure_db_ready() -> None:
+    """
+    Initialize the database once per process.
+
+    Called from the application lifespan rather than at import time. A failed
+    attempt raises and is not cached, so a later call will retry.
+    """
+    initialize_database()
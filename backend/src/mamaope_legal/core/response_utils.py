@@ -4,11 +4,20 @@ Utility functions for generating standardized API responses.
 
 import time
 from typing import Any, Dict, List, Optional
-from datetime import datetime
+from datetime import datetime, timezone
 from fastapi import HTTPException
 from mamaope_legal.schemas import StandardResponse, Metadata, ErrorResponse, SuccessResponse
 
 
+def utc_timestamp(timespec: str = "milliseconds") -> str:
+    """Current UTC time as an ISO 8601 string (millisecond precision by default)."""
+    return datetime.now(timezone.utc).isoformat(timespec=timespec)
+
+
+# Response envelopes are built from values generated here, so the helpers use
+# model_construct and skip Pydantic validation on every request.
+
+
 def create_success_response(
     data: Any,
     status_code: int = 200,
@@ -20,21 +29,21 @@ def create_success_response(
     
     # Wrap data in success response if it's not already wrapped
     if not isinstance(data, SuccessResponse) and message:
-        wrapped_data = SuccessResponse(
+        wrapped_data = SuccessResponse.model_construct(
             message=message,
             details=additional_details
         )
     else:
         wrapped_data = data
     
-    metadata = Metadata(
+    metadata = Metadata.model_construct(
         statusCode=status_code,
         errors=[],
         executionTime=execution_time or 0.0,
-        timestamp=datetime.utcnow()
+        timestamp=utc_timestamp()
     )
     
-    return StandardResponse(
+    return StandardResponse.model_construct(
         data=wrapped_data,
         metadata=metadata,
         success=1
@@ -50,19 +59,19 @@ def create_error_response(
 ) -> StandardResponse:
     """Create a standardized error response."""
     
-    error_data = ErrorResponse(
+    error_data = ErrorResponse.model_construct(
         message=message,
         details=additional_details
     )
     
-    metadata = Metadata(
+    metadata = Metadata.model_construct(
         statusCode=status_code,
         errors=errors or [message],
         executionTime=execution_time or 0.0,
-        timestamp=datetime.utcnow()
+        timestamp=utc_timestamp()
     )
     
-    return StandardResponse(
+    return StandardResponse.model_construct(
         data=error_data,
         metadata=metadata,
         success=0
@@ -93,21 +102,27 @@ def create_http_exception(
 
 
 class ResponseTimer:
-    """Context manager for measuring execution time."""
+    """Context manager for measuring execution time.
+
+    Uses the monotonic ``perf_counter_ns`` clock; the elapsed time is
+    computed once on exit and cached for subsequent reads.
+    """
+    
+    __slots__ = ("_t0", "execution_time")
     
     def __init__(self):
-        self.start_time = None
+        self._t0 = None
         self.execution_time = None
     
     def __enter__(self):
-        self.start_time = time.time()
+        self._t0 = time.perf_counter_ns()
         return self
     
     def __exit__(self, exc_type, exc_val, exc_tb):
-        self.execution_time = time.time() - self.start_time
+        self.execution_time = (time.perf_counter_ns() - self._t0) / 1e9
     
     def get_execution_time(self) -> float:
-        """Get the execution time."""
+        """Get the execution time in seconds."""
         if self.execution_time is None:
-            return time.time() - self.start_time
+            return (time.perf_counter_ns() - self._t0) / 1e9
         return self.execution_time
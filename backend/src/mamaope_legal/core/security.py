@@ -6,16 +6,23 @@ utilities following medical software security standards (HIPAA/GDPR/ISO 13485).
 """
 
 import os
+import re
 import secrets
 import hashlib
 import hmac
 from datetime import datetime, timedelta
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, Tuple
+from cryptography.exceptions import InvalidTag
 from cryptography.fernet import Fernet
 from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+from cryptography.hazmat.primitives.kdf.hkdf import HKDF
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 import base64
+import binascii
 import logging
+from collections import Counter
+from types import SimpleNamespace
 
 logger = logging.getLogger(__name__)
 
@@ -26,6 +33,7 @@ class SecurityConfig:
     # Encryption settings
     ENCRYPTION_KEY_LENGTH = 32
     SALT_LENGTH = 16
+    NONCE_LENGTH = 12
     
     # Token settings
     ACCESS_TOKEN_EXPIRE_MINUTES = 30  # Reduced from 60 for better security
@@ -54,12 +62,30 @@ class SecurityConfig:
     MAX_QUERY_LENGTH = 2000
 
 
+# Every Fernet token starts with the 0x80 version byte and a 64-bit timestamp
+_FERNET_TOKEN_PREFIX = b"gAAAAA"
+
+
 class EncryptionService:
     """Service for encrypting/decrypting sensitive medical data."""
     
     def __init__(self):
-        self._key = self._get_or_create_encryption_key()
-        self._fernet = Fernet(self._key)
+        key = self._get_or_create_encryption_key()
+        # Keys are either raw 32 bytes or a urlsafe-base64 Fernet key
+        self._key = key if len(key) == SecurityConfig.ENCRYPTION_KEY_LENGTH else base64.urlsafe_b64decode(key)
+        # AES-GCM gets its own HKDF subkey so the master key never keys two ciphers
+        self._aead = AESGCM(self._derive_subkey(b"mamaope-phi-aes-gcm"))
+        # Legacy Fernet primitive, decrypt-only; existing tokens were written with the master key
+        self._fernet = Fernet(base64.urlsafe_b64encode(self._key))
+    
+    def _derive_subkey(self, info: bytes) -> bytes:
+        """Derive a per-cipher subkey from the master key."""
+        return HKDF(
+            algorithm=hashes.SHA256(),
+            length=SecurityConfig.ENCRYPTION_KEY_LENGTH,
+            salt=None,
+            info=info,
+        ).derive(self._key)
     
     def _get_or_create_encryption_key(self) -> bytes:
         """Get or create encryption key from environment."""
@@ -99,7 +125,7 @@ class EncryptionService:
             data: Plain text PHI data to encrypt
             
         Returns:
-            Base64 encoded encrypted data
+            Base64 encoded nonce + AES-GCM ciphertext
             
         Raises:
             ValueError: If data is too large or invalid
@@ -111,8 +137,9 @@ class EncryptionService:
             raise ValueError(f"Data too large. Max size: {SecurityConfig.MAX_PATIENT_DATA_LENGTH} bytes")
         
         try:
-            encrypted_data = self._fernet.encrypt(data.encode('utf-8'))
-            return base64.b64encode(encrypted_data).decode('utf-8')
+            nonce = secrets.token_bytes(SecurityConfig.NONCE_LENGTH)
+            ciphertext = self._aead.encrypt(nonce, data.encode('utf-8'), None)
+            return base64.b64encode(nonce + ciphertext).decode('ascii')
         except Exception as e:
             logger.error(f"Encryption failed: {e}")
             raise ValueError("Encryption failed")
@@ -131,14 +158,52 @@ class EncryptionService:
             ValueError: If decryption fails
         """
         try:
-            decoded_data = base64.b64decode(encrypted_data.encode('utf-8'))
-            decrypted_data = self._fernet.decrypt(decoded_data)
+            raw = encrypted_data.encode('ascii')
+            nonce_length = SecurityConfig.NONCE_LENGTH
+            try:
+                decoded_data = base64.b64decode(raw, validate=True)
+                decrypted_data = self._aead.decrypt(
+                    decoded_data[:nonce_length], decoded_data[nonce_length:], None
+                )
+            except (binascii.Error, InvalidTag):
+                # Ciphertext written before the AES-GCM switch: a Fernet token,
+                # stored either as-is or wrapped in another layer of base64
+                token = raw if raw.startswith(_FERNET_TOKEN_PREFIX) else base64.b64decode(raw)
+                decrypted_data = self._fernet.decrypt(token)
             return decrypted_data.decode('utf-8')
         except Exception as e:
             logger.error(f"Decryption failed: {e}")
             raise ValueError("Decryption failed")
 
 
+# Character classes tracked by the single-pass password scan
+_SPECIAL = frozenset("!@#$%^&*()_+-=[]{}|;:,.<>?")
+_HAS_UPPER = 1
+_HAS_LOWER = 2
+_HAS_DIGIT = 4
+_HAS_SPECIAL = 8
+
+# Attribute-access snapshot of the password policy, resolved once at import
+_REQS = SimpleNamespace(**SecurityConfig.PASSWORD_REQUIREMENTS)
+_FORBIDDEN_LOWER = tuple(p.casefold() for p in _REQS.forbidden_patterns)
+
+
+def _scan_password(password: str) -> Tuple[int, Counter]:
+    """Return a character-class bitmask and per-character counts in one pass."""
+    counts = Counter(password)
+    flags = 0
+    for c in counts:
+        if c.isupper():
+            flags |= _HAS_UPPER
+        elif c.islower():
+            flags |= _HAS_LOWER
+        if c.isdigit():
+            flags |= _HAS_DIGIT
+        elif c in _SPECIAL:
+            flags |= _HAS_SPECIAL
+    return flags, counts
+
+
 class PasswordValidator:
     """Validates password strength according to medical software standards."""
     
@@ -153,73 +218,77 @@ class PasswordValidator:
         Returns:
             Dict with validation results
         """
-        requirements = SecurityConfig.PASSWORD_REQUIREMENTS
         errors = []
         warnings = []
+        flags, counts = _scan_password(password)
         
         # Length validation
-        if len(password) < requirements['min_length']:
-            errors.append(f"Password must be at least {requirements['min_length']} characters")
-        if len(password) > requirements['max_length']:
-            errors.append(f"Password must be no more than {requirements['max_length']} characters")
+        if len(password) < _REQS.min_length:
+            errors.append(f"Password must be at least {_REQS.min_length} characters")
+        if len(password) > _REQS.max_length:
+            errors.append(f"Password must be no more than {_REQS.max_length} characters")
         
         # Character requirements
-        if requirements['require_uppercase'] and not any(c.isupper() for c in password):
+        if _REQS.require_uppercase and not flags & _HAS_UPPER:
             errors.append("Password must contain at least one uppercase letter")
         
-        if requirements['require_lowercase'] and not any(c.islower() for c in password):
+        if _REQS.require_lowercase and not flags & _HAS_LOWER:
             errors.append("Password must contain at least one lowercase letter")
         
-        if requirements['require_digits'] and not any(c.isdigit() for c in password):
+        if _REQS.require_digits and not flags & _HAS_DIGIT:
             errors.append("Password must contain at least one digit")
         
-        if requirements['require_special_chars']:
-            special_chars = "!@#$%^&*()_+-=[]{}|;:,.<>?"
-            if not any(c in special_chars for c in password):
-                errors.append("Password must contain at least one special character")
+        if _REQS.require_special_chars and not flags & _HAS_SPECIAL:
+            errors.append("Password must contain at least one special character")
         
         # Forbidden patterns
-        password_lower = password.lower()
-        for pattern in requirements['forbidden_patterns']:
-            if pattern in password_lower:
+        password_folded = password.casefold()
+        for pattern in _FORBIDDEN_LOWER:
+            if pattern in password_folded:
                 errors.append(f"Password cannot contain '{pattern}'")
         
         # Additional security checks
-        if password.count(password[0]) > len(password) * 0.5:
+        if password and counts[password[0]] > len(password) * 0.5:
             warnings.append("Password has too many repeated characters")
         
         return {
             'is_valid': len(errors) == 0,
             'errors': errors,
             'warnings': warnings,
-            'strength_score': PasswordValidator._calculate_strength_score(password)
+            'strength_score': PasswordValidator._calculate_strength_score(password, (flags, counts))
         }
     
     @staticmethod
-    def _calculate_strength_score(password: str) -> int:
+    def _calculate_strength_score(password: str, scan: Optional[Tuple[int, Counter]] = None) -> int:
         """Calculate password strength score (0-100)."""
+        flags, counts = scan or _scan_password(password)
         score = 0
         
         # Length score
         score += min(len(password) * 2, 40)
         
         # Character variety
-        if any(c.isupper() for c in password):
-            score += 10
-        if any(c.islower() for c in password):
-            score += 10
-        if any(c.isdigit() for c in password):
-            score += 10
-        if any(c in "!@#$%^&*()_+-=[]{}|;:,.<>?" for c in password):
-            score += 10
+        for flag in (_HAS_UPPER, _HAS_LOWER, _HAS_DIGIT, _HAS_SPECIAL):
+            if flags & flag:
+                score += 10
         
         # Complexity bonus
-        unique_chars = len(set(password))
+        unique_chars = len(counts)
         score += min(unique_chars * 2, 20)
         
         return min(score, 100)
 
 
+# SecureLogger level names, resolved once rather than via an if/elif chain
+_LOG_LEVELS = {
+    'debug': logging.DEBUG,
+    'info': logging.INFO,
+    'warning': logging.WARNING,
+    'error': logging.ERROR,
+    'critical': logging.CRITICAL,
+}
+
+
 class SecureLogger:
     """Secure logging utility that prevents PHI leakage."""
     
@@ -244,13 +313,7 @@ class SecureLogger:
         Returns:
             Sanitized message with PHI replaced by [REDACTED]
         """
-        import re
-        
-        sanitized = message
-        for pattern in SecureLogger.PHI_PATTERNS:
-            sanitized = re.sub(pattern, '[REDACTED]', sanitized, flags=re.IGNORECASE)
-        
-        return sanitized
+        return _PHI_RE.sub('[REDACTED]', message)
     
     @staticmethod
     def log_securely(level: str, message: str, **kwargs):
@@ -262,18 +325,12 @@ class SecureLogger:
             message: Log message
             **kwargs: Additional logging parameters
         """
-        sanitized_message = SecureLogger.sanitize_log_message(message)
+        log_level = _LOG_LEVELS.get(level.lower(), logging.DEBUG)
+        # Skip the PHI scan entirely when the record would be discarded
+        if not logger.isEnabledFor(log_level):
+            return
         
-        if level.lower() == 'info':
-            logger.info(sanitized_message, **kwargs)
-        elif level.lower() == 'warning':
-            logger.warning(sanitized_message, **kwargs)
-        elif level.lower() == 'error':
-            logger.error(sanitized_message, **kwargs)
-        elif level.lower() == 'critical':
-            logger.critical(sanitized_message, **kwargs)
-        else:
-            logger.debug(sanitized_message, **kwargs)
+        logger.log(log_level, SecureLogger.sanitize_log_message(message), **kwargs)
 
     def log_request(self, action: str, details: Dict[str, Any]):
         """
@@ -283,10 +340,40 @@ class SecureLogger:
             action: The action being logged (e.g., 'generate_response', 'generate_response_success')
             details: Dictionary of details to log
         """
+        if not logger.isEnabledFor(logging.INFO):
+            return
         message = f"Action: {action}, Details: {details}"
         SecureLogger.log_securely('info', message)
 
 
+# All PHI patterns fused into one alternation so a message is scanned once
+_PHI_RE = re.compile(
+    "|".join(f"(?:{pattern})" for pattern in SecureLogger.PHI_PATTERNS),
+    re.IGNORECASE
+)
+
+# Same mapping as html.escape(quote=True), applied in a single C-level pass
+_HTML_ESCAPE = str.maketrans({
+    "&": "&amp;",
+    "<": "&lt;",
+    ">": "&gt;",
+    '"': "&quot;",
+    "'": "&#x27;",
+})
+_WS_RE = re.compile(r"\s+")
+
+# Potentially malicious content rejected in patient data
+_DANGEROUS_RE = re.compile(
+    "|".join([
+        r'<script.*?>.*?</script>',  # Script tags
+        r'javascript:',  # JavaScript protocol
+        r'data:text/html',  # Data URLs
+        r'vbscript:',  # VBScript
+    ]),
+    re.IGNORECASE | re.DOTALL
+)
+
+
 class InputValidator:
     """Validates and sanitizes user inputs."""
     
@@ -314,17 +401,8 @@ class InputValidator:
             }
         
         # Check for potentially malicious content
-        dangerous_patterns = [
-            r'<script.*?>.*?</script>',  # Script tags
-            r'javascript:',  # JavaScript protocol
-            r'data:text/html',  # Data URLs
-            r'vbscript:',  # VBScript
-        ]
-        
-        import re
-        for pattern in dangerous_patterns:
-            if re.search(pattern, data, re.IGNORECASE):
-                return {'is_valid': False, 'error': 'Invalid content detected'}
+        if _DANGEROUS_RE.search(data):
+            return {'is_valid': False, 'error': 'Invalid content detected'}
         
         return {'is_valid': True, 'sanitized_data': InputValidator._sanitize_text(data)}
     
@@ -405,15 +483,8 @@ class InputValidator:
     @staticmethod
     def _sanitize_text(text: str) -> str:
         """Basic text sanitization."""
-        import html
-        
-        # HTML escape
-        sanitized = html.escape(text)
-        
-        # Remove excessive whitespace
-        sanitized = ' '.join(sanitized.split())
-        
-        return sanitized
+        # HTML escape, then collapse runs of whitespace
+        return _WS_RE.sub(' ', text.translate(_HTML_ESCAPE)).strip()
 
 
 def generate_secure_secret_key() -> str:
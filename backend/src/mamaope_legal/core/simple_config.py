@@ -7,7 +7,10 @@ that focuses on essential settings without unnecessary complexity.
 
 import os
 import logging
-from typing import Dict, Any, Optional
+from types import MappingProxyType
+from typing import Dict, Any, Mapping, Optional
+
+import orjson
 from pydantic import BaseModel, Field
 from dotenv import load_dotenv
 
@@ -51,6 +54,13 @@ class SimpleConfig:
         """Initialize configuration."""
         try:
             self.ai = SimpleAIConfig()
+            self._temps = {
+                "drug_info": self.ai.drug_info_temperature,
+                "diagnosis": self.ai.diagnosis_temperature,
+            }
+            # Config is immutable after load, so serialize it once
+            self._as_dict = MappingProxyType(self._build_dict())
+            self._as_json = orjson.dumps(self._build_dict())
             logger.info("Simple configuration loaded successfully")
         except Exception as e:
             logger.error(f"Configuration loading failed: {e}")
@@ -58,15 +68,10 @@ class SimpleConfig:
     
     def get_temperature(self, query_type: str) -> float:
         """Get temperature for query type."""
-        if query_type == "drug_info":
-            return self.ai.drug_info_temperature
-        elif query_type == "diagnosis":
-            return self.ai.diagnosis_temperature
-        else:
-            return self.ai.general_temperature
+        return self._temps.get(query_type, self.ai.general_temperature)
     
-    def to_dict(self) -> Dict[str, Any]:
-        """Convert configuration to dictionary."""
+    def _build_dict(self) -> Dict[str, Any]:
+        """Build the configuration dictionary."""
         return {
             "model_name": self.ai.model_name,
             "project_id": self.ai.project_id,
@@ -88,6 +93,14 @@ class SimpleConfig:
                 "retry_delay": self.ai.retry_delay
             }
         }
+    
+    def to_dict(self) -> Mapping[str, Any]:
+        """Convert configuration to a read-only dictionary view."""
+        return self._as_dict
+    
+    def to_json(self) -> bytes:
+        """Configuration serialized as JSON bytes."""
+        return self._as_json
 
 
 # Global configuration instance
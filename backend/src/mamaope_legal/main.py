@@ -2,15 +2,20 @@
 Main FastAPI application for Mamaope Legal AI.
 """
 
+import asyncio
 import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
 import time
 
 from mamaope_legal.core.config import get_config
-from mamaope_legal.core.response_utils import create_success_response, create_error_response, ResponseTimer
+from mamaope_legal.core.database import request_session_scope
+from mamaope_legal.core.response_utils import create_success_response, create_error_response, utc_timestamp, ResponseTimer
 from mamaope_legal.schemas import StandardResponse
 from mamaope_legal.api.v1 import auth, legal_consultation, chat_sessions
 
@@ -23,9 +28,19 @@ async def lifespan(app: FastAPI):
     """Application lifespan manager."""
     # Startup
     logger.info("Starting Mamaope Legal AI application...")
+    
+    # Service calls run on the default executor via asyncio.to_thread; size it to the
+    # database pool's capacity so concurrent requests are not capped below it
+    db_capacity = config.database.db_pool_size + config.database.effective_max_overflow
+    executor = ThreadPoolExecutor(
+        max_workers=max(db_capacity, min(32, (os.cpu_count() or 1) + 4)),
+        thread_name_prefix="service-io"
+    )
+    asyncio.get_running_loop().set_default_executor(executor)
+    
     try:
-        from mamaope_legal.core.database import initialize_database
-        initialize_database()
+        from mamaope_legal.core.database import ensure_db_ready
+        ensure_db_ready()
         logger.info("Database initialization completed")
     except Exception as e:
         logger.warning(f"Database initialization failed during startup: {e}")
@@ -47,12 +62,22 @@ async def lifespan(app: FastAPI):
         logger.warning(f"GenAI client initialization failed during startup: {e}")
         logger.info("Application will continue - AI functionality may be limited")
     
+    cache_sweeper = None
+    try:
+        from mamaope_legal.services.conversational_service import run_cache_sweeper
+        cache_sweeper = asyncio.create_task(run_cache_sweeper())
+    except Exception as e:
+        logger.warning(f"Cache sweeper could not be started: {e}")
+    
     logger.info("Application startup completed successfully")
     
     yield
     
     # Shutdown
     logger.info("Shutting down Mamaope Legal AI application...")
+    if cache_sweeper is not None:
+        cache_sweeper.cancel()
+    executor.shutdown(wait=False)
 
 
 # Create FastAPI application
@@ -61,33 +86,42 @@ app = FastAPI(
     description=config.application.app_description,
     version=config.application.app_version,
     lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
-    allow_origins=["*"],  # Configure properly for production
+    allow_origins=config.application.cors_origins,
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=["GET", "POST", "PUT", "DELETE", "OPTIONS"],
+    allow_headers=["authorization", "content-type"],
+    max_age=86400,  # Let browsers cache preflight responses for a day
 )
 
+# Compress large payloads (chat history, session messages)
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=5)
+
 
 # Request logging middleware
 @app.middleware("http")
 async def log_requests(request: Request, call_next):
-    """Log all requests."""
-    start_time = time.time()
-    
-    # Log request
-    logger.info(f"Request: {request.method} {request.url}")
+    """Log all requests and stamp the X-Response-Time header."""
+    start_ns = time.perf_counter_ns()
+    request.state.t0 = start_ns
     
-    # Process request
-    response = await call_next(request)
+    # Process request; DB sessions opened while handling it share one Session
+    with request_session_scope(id(request)):
+        response = await call_next(request)
     
-    # Log response
-    process_time = time.time() - start_time
-    logger.info(f"Response: {response.status_code} - {process_time:.3f}s")
+    # Log response (formatting is deferred to the handler and skipped when disabled)
+    process_ms = (time.perf_counter_ns() - start_ns) / 1e6
+    response.headers["X-Response-Time"] = f"{process_ms:.3f}ms"
+    if logger.isEnabledFor(logging.INFO):
+        logger.info(
+            "%s %s -> %d in %.3f ms",
+            request.method, request.url.path, response.status_code, process_ms
+        )
     
     return response
 
@@ -98,15 +132,19 @@ async def http_exception_handler(request: Request, exc: HTTPException):
     """HTTP exception handler."""
     logger.warning(f"HTTP exception: {exc.status_code} - {exc.detail}")
     
+    # Request start is stamped by the logging middleware
+    start_ns = getattr(request.state, "t0", None)
+    execution_time = (time.perf_counter_ns() - start_ns) / 1e9 if start_ns else 0.0
+    
     # Create standardized error response
     error_response = create_error_response(
         message=str(exc.detail),
         status_code=exc.status_code,
         errors=[str(exc.detail)],
-        execution_time=0.0
+        execution_time=execution_time
     )
     
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=exc.status_code,
         content=error_response.model_dump(mode='json')
     )
@@ -126,29 +164,39 @@ async def global_exception_handler(request: Request, exc: Exception):
         execution_time=0.0
     )
     
-    return JSONResponse(
+    return ORJSONResponse(
         status_code=500,
         content=error_response.model_dump(mode='json')
     )
 
 
 # Health check endpoint
+# Load balancers poll this constantly, so the envelope is rendered once at
+# import and only the per-call fields are filled in.
+_HEALTH_TEMPLATE = create_success_response(
+    data={
+        "status": "healthy",
+        "timestamp": 0.0,
+        "version": config.application.app_version,
+        "environment": config.application.environment
+    },
+    status_code=200
+).model_dump(mode="json")
+
+
 @app.get("/health", response_model=StandardResponse)
 async def health_check():
     """Application health check."""
     with ResponseTimer() as timer:
-        health_data = {
-            "status": "healthy",
-            "timestamp": time.time(),
-            "version": config.application.app_version,
-            "environment": config.application.environment
-        }
-        
-        return create_success_response(
-            data=health_data,
-            status_code=200,
-            execution_time=timer.get_execution_time()
-        )
+        return ORJSONResponse({
+            **_HEALTH_TEMPLATE,
+            "data": {**_HEALTH_TEMPLATE["data"], "timestamp": time.time()},
+            "metadata": {
+                **_HEALTH_TEMPLATE["metadata"],
+                "executionTime": timer.get_execution_time(),
+                "timestamp": utc_timestamp()
+            }
+        })
 
 API_VERSION_PREFIX = "/api/v1"
 
@@ -157,12 +205,33 @@ app.include_router(auth.router, prefix=f"{API_VERSION_PREFIX}/auth", tags=["Auth
 app.include_router(legal_consultation.router, prefix=f"{API_VERSION_PREFIX}/consult", tags=["Legal Consultation"])
 app.include_router(chat_sessions.router, prefix=f"{API_VERSION_PREFIX}/chat", tags=["Chat Sessions"])
 
+# Starlette matches routes linearly, so put the most frequently hit paths first.
+# The sort is stable: everything else keeps its registration order.
+_ROUTE_PRIORITY = {
+    path: rank for rank, path in enumerate((
+        "/health",
+        f"{API_VERSION_PREFIX}/consult/analyze",
+        f"{API_VERSION_PREFIX}/chat/sessions/{{session_id}}/messages",
+        f"{API_VERSION_PREFIX}/chat/sessions",
+        f"{API_VERSION_PREFIX}/chat/sessions/{{session_id}}",
+    ))
+}
+app.router.routes.sort(key=lambda route: _ROUTE_PRIORITY.get(getattr(route, "path", ""), len(_ROUTE_PRIORITY)))
+
 if __name__ == "__main__":
     import uvicorn
+    
+    # One worker per core unless overridden; reload only works with a single process
+    workers = int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1))
+    reload = config.application.debug and workers == 1
+    logger.info(f"Starting uvicorn with {workers} worker(s)")
     uvicorn.run(
-        "main:app",
+        "mamaope_legal.main:app",
         host=config.application.api_host,
         port=config.application.api_port,
-        reload=config.application.debug,
+        workers=workers,
+        loop="uvloop",
+        http="httptools",
+        reload=reload,
         log_level=config.application.debug and "debug" or "info"
     )
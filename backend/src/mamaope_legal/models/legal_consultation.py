@@ -2,9 +2,8 @@
 Legal Consultation Session and Chat Message models for Mamaope Legal AI.
 """
 
-from datetime import datetime
 from typing import Optional, List
-from sqlalchemy import Boolean, Column, Integer, String, Text, ForeignKey
+from sqlalchemy import Boolean, Column, DateTime, Index, Integer, String, Text, ForeignKey, func
 from sqlalchemy.orm import relationship
 
 from mamaope_legal.models.base import Base
@@ -18,16 +17,28 @@ class LegalConsultation(Base):
     __tablename__ = "legal_consultations"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
     session_name = Column(String(255), nullable=True)
     case_summary = Column(Text, nullable=True)
     is_active = Column(Boolean, nullable=False, default=True)
-    created_at = Column(String, nullable=True, default=lambda: datetime.utcnow().isoformat())
-    updated_at = Column(String, nullable=True, default=lambda: datetime.utcnow().isoformat())
+    # Maintained by LegalConsultationService.add_message so reads never COUNT messages
+    message_count = Column(Integer, nullable=False, default=0, server_default="0")
+    created_at = Column(DateTime(timezone=True), nullable=True, server_default=func.now())
+    updated_at = Column(DateTime(timezone=True), nullable=True, server_default=func.now(), onupdate=func.now())
 
     # Relationships
     user = relationship("User", back_populates="legal_consultations")
-    chat_messages = relationship("ChatMessage", back_populates="session", cascade="all, delete-orphan")
+    chat_messages = relationship(
+        "ChatMessage", back_populates="session", cascade="all, delete-orphan", order_by="ChatMessage.id"
+    )
+
+    # Session listing: WHERE user_id = ? ORDER BY updated_at DESC
+    __table_args__ = (
+        Index("ix_legal_consultations_user_updated", "user_id", updated_at.desc()),
+    )
+
+    # Fetch server-generated timestamps in the INSERT/UPDATE itself (RETURNING)
+    __mapper_args__ = {"eager_defaults": True}
 
     def __repr__(self):
         return f"<LegalConsultation(id={self.id}, user_id={self.user_id}, name='{self.session_name}')>"
@@ -41,15 +52,22 @@ class ChatMessage(Base):
     __tablename__ = "chat_messages"
 
     id = Column(Integer, primary_key=True, index=True)
-    session_id = Column(Integer, ForeignKey("legal_consultations.id"), nullable=False, index=True)
+    session_id = Column(Integer, ForeignKey("legal_consultations.id"), nullable=False)
     message_type = Column(String(20), nullable=False)  # 'user', 'assistant', or 'system'
     content = Column(Text, nullable=False)
     case_data = Column(Text, nullable=True)
     analysis_complete = Column(Boolean, nullable=False, default=False)
-    created_at = Column(String, nullable=True, default=lambda: datetime.utcnow().isoformat())
+    created_at = Column(DateTime(timezone=True), nullable=True, server_default=func.now())
 
     # Relationships
     session = relationship("LegalConsultation", back_populates="chat_messages")
 
+    # History reads: WHERE session_id = ? ORDER BY id (ids follow insert order)
+    __table_args__ = (
+        Index("ix_chat_messages_session_id_id", "session_id", "id"),
+    )
+
+    __mapper_args__ = {"eager_defaults": True}
+
     def __repr__(self):
         return f"<ChatMessage(id={self.id}, session_id={self.session_id}, type='{self.message_type}')>"
\ No newline at end of file
@@ -2,9 +2,9 @@
 Pydantic schemas for request/response validation.
 """
 
-from pydantic import BaseModel, Field, EmailStr
+from pydantic import AliasChoices, BaseModel, ConfigDict, Field, EmailStr, TypeAdapter
 from typing import Optional, Dict, Any, Generic, TypeVar, List
-from datetime import datetime
+from datetime import datetime, timezone
 import time
 
 # Generic type for response data
@@ -15,21 +15,10 @@ class Metadata(BaseModel):
     statusCode: int = Field(..., description="HTTP status code")
     errors: List[str] = Field(default_factory=list, description="List of error messages")
     executionTime: float = Field(..., description="Request execution time in seconds")
-    timestamp: datetime = Field(default_factory=datetime.utcnow, description="Response timestamp")
-    
-    def model_dump(self, **kwargs):
-        """Custom model dump to handle datetime serialization."""
-        data = super().model_dump(**kwargs)
-        # Convert datetime to ISO string
-        if isinstance(data.get('timestamp'), datetime):
-            data['timestamp'] = data['timestamp'].isoformat()
-        return data
-    
-    def model_dump_json(self, **kwargs):
-        """Custom JSON dump to handle datetime serialization."""
-        import json
-        data = self.model_dump(**kwargs)
-        return json.dumps(data, default=str)
+    timestamp: str = Field(
+        default_factory=lambda: datetime.now(timezone.utc).isoformat(timespec="milliseconds"),
+        description="Response timestamp (ISO 8601, UTC)"
+    )
 
 class StandardResponse(BaseModel, Generic[T]):
     """Standard API response wrapper."""
@@ -50,11 +39,17 @@ class SuccessResponse(BaseModel):
 
 class LegalQueryInput(BaseModel):
     """Input schema for legal consultation requests."""
+    model_config = ConfigDict(frozen=True)
+    
     case_data: str = Field(..., min_length=10, max_length=10000, description="Legal case data for analysis")
     chat_history: Optional[str] = Field(default="", max_length=50000, description="Previous conversation history")
     session_id: Optional[int] = Field(None, description="Chat session ID to store the conversation")
 
 
+# Built once at import so /analyze can validate the raw request body directly
+LEGAL_QUERY_INPUT_ADAPTER = TypeAdapter(LegalQueryInput)
+
+
 class LegalQueryResponse(BaseModel):
     """Response schema for legal consultation results."""
     model_response: str = Field(..., description="AI model response")
@@ -81,18 +76,22 @@ class ChatSessionUpdate(BaseModel):
 
 class ChatSessionResponse(BaseModel):
     """Schema for chat session responses."""
+    model_config = ConfigDict(from_attributes=True)
+    
     id: int
     user_id: int
     session_name: Optional[str]
     case_summary: Optional[str]
     is_active: bool
-    created_at: Optional[str]
-    updated_at: Optional[str]
+    created_at: Optional[datetime]
+    updated_at: Optional[datetime]
     message_count: Optional[int] = Field(default=0, description="Number of messages in the session")
 
 
 class ChatMessageCreate(BaseModel):
     """Schema for creating a new chat message."""
+    model_config = ConfigDict(frozen=True)
+    
     content: str = Field(..., min_length=1, max_length=10000, description="Message content")
     message_type: str = Field(..., description="Type of message: 'user', 'assistant', or 'system'")
     case_data: Optional[str] = Field(None, max_length=10000, description="Legal case data associated with the message")
@@ -101,18 +100,25 @@ class ChatMessageCreate(BaseModel):
 
 class ChatMessageResponse(BaseModel):
     """Schema for chat message responses."""
+    model_config = ConfigDict(from_attributes=True)
+    
     id: int
     session_id: int
     message_type: str
     content: str
     case_data: Optional[str]
     analysis_complete: bool
-    created_at: Optional[str]
+    created_at: Optional[datetime]
 
 
 class ChatSessionWithMessages(ChatSessionResponse):
     """Schema for chat session with messages."""
-    messages: List[ChatMessageResponse] = Field(default_factory=list, description="Messages in the session")
+    # Read from LegalConsultation.chat_messages when validated from the ORM object
+    messages: List[ChatMessageResponse] = Field(
+        default_factory=list,
+        validation_alias=AliasChoices("messages", "chat_messages"),
+        description="Messages in the session"
+    )
 
 
 class ChatSessionListResponse(BaseModel):
@@ -132,18 +138,6 @@ class UserCreate(BaseModel):
     email: EmailStr = Field(..., description="Email address")
     password: str = Field(..., min_length=12, max_length=128, description="Password")
     role: str = Field(default="user", description="User role")
-    
-    def model_post_init(self, __context):
-        """Generate username and full_name from first_name and last_name if not provided."""
-        if not self.username and self.first_name and self.last_name:
-            # Generate username from first and last name with timestamp for uniqueness
-            from datetime import datetime
-            timestamp = datetime.utcnow().strftime("%Y%m%d%H%M%S%f")
-            self.username = f"{self.first_name.lower()}.{self.last_name.lower()}.{timestamp}"
-        
-        if not self.full_name and self.first_name and self.last_name:
-            # Generate full_name from first and last name
-            self.full_name = f"{self.first_name} {self.last_name}"
 
 
 class UserUpdate(BaseModel):
@@ -0,0 +1,85 @@
+"""
+Circuit breaker for upstream model calls.
+
+After a run of consecutive upstream failures the breaker opens and callers
+fail fast instead of adding load to a degraded service. Once the reset
+timeout has passed a single trial call is let through; success closes the
+breaker again, failure re-opens it.
+"""
+
+import time
+import logging
+import threading
+from typing import Any, Dict
+
+from mamaope_legal.core.constants import CIRCUIT_FAILURE_THRESHOLD, CIRCUIT_RESET_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised when a call is rejected because the circuit is open."""
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker with a half-open trial call."""
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = CIRCUIT_FAILURE_THRESHOLD,
+        reset_seconds: float = CIRCUIT_RESET_SECONDS
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self._failures = 0
+        self._opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def before_call(self) -> None:
+        """
+        Check whether a call may proceed.
+
+        Raises:
+            CircuitOpenError: If the circuit is open (or a trial call is already running)
+        """
+        with self._lock:
+            if self._opened_at is None:
+                return
+            if time.monotonic() - self._opened_at < self.reset_seconds or self._trial_in_flight:
+                raise CircuitOpenError(f"{self.name} circuit is open")
+            # Half-open: let one trial call through
+            self._trial_in_flight = True
+
+    def record_success(self) -> None:
+        """Close the circuit after a successful call."""
+        with self._lock:
+            if self._opened_at is not None:
+                logger.info(f"{self.name} circuit closed")
+            self._failures = 0
+            self._opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self) -> None:
+        """Count an upstream failure, opening the circuit at the threshold."""
+        with self._lock:
+            self._failures += 1
+            self._trial_in_flight = False
+            if self._opened_at is not None or self._failures >= self.failure_threshold:
+                if self._opened_at is None:
+                    logger.warning(f"{self.name} circuit opened after {self._failures} consecutive failures")
+                self._opened_at = time.monotonic()
+
+    def release(self) -> None:
+        """Forget an abandoned call (e.g. cancelled) without counting it either way."""
+        with self._lock:
+            self._trial_in_flight = False
+
+    def state(self) -> Dict[str, Any]:
+        """Breaker state for health reporting."""
+        return {
+            "open": self._opened_at is not None,
+            "consecutive_failures": self._failures
+        }
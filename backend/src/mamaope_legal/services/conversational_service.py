@@ -1,23 +1,24 @@
-import os
 import time
 import logging
 import asyncio
 import hashlib
+import itertools
+from collections import Counter, OrderedDict, deque
+from functools import lru_cache
+import httpx
 from fastapi import HTTPException
 from mamaope_legal.services.genai_client import get_genai_client
-from mamaope_legal.services.vectorstore_manager import search_all_collections, enrich_retrieval_results, build_context
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_not_exception_type
+from mamaope_legal.services.vectorstore_manager import search_all_collections, embed_search_query, document_name
+from mamaope_legal.services.semantic_cache import semantic_cache
+from mamaope_legal.services.circuit_breaker import CircuitBreaker, CircuitOpenError
+from tenacity import retry, stop_after_attempt, wait_exponential_jitter, retry_if_not_exception_type
 from dotenv import load_dotenv
-from typing import Dict, Tuple, List
-from google.api_core import exceptions
-from enum import Enum
-from datetime import datetime, timedelta
+from typing import AsyncIterator, Deque, Dict, Tuple, List
 
 from mamaope_legal.core.constants import (
-    MODEL_NAME, PROMPT_TOKEN_LIMIT, CACHE_TTL_MINUTES, MAX_CACHE_SIZE,
-    DEFAULT_CONTEXT_MAX_CHARS, BALANCED_CONTEXT_MAX_CHARS,
-    MAX_RETRY_ATTEMPTS, RETRY_MULTIPLIER, RETRY_MIN_WAIT, RETRY_MAX_WAIT,
-    OPTIMIZED_PROMPT, PROMPT
+    MODEL_NAME, PROMPT_TOKEN_LIMIT, CACHE_TTL_MINUTES, MAX_CACHE_SIZE, CACHE_EVICTION_SAMPLE_SIZE,
+    CACHE_SWEEP_INTERVAL_SECONDS, MAX_RETRY_ATTEMPTS, RETRY_MIN_WAIT, RETRY_MAX_WAIT,
+    OPTIMIZED_PROMPT
 )
 
 logging.basicConfig(
@@ -28,153 +29,399 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 load_dotenv()
 
-# Simple in-memory cache for responses
-RESPONSE_CACHE: Dict[str, Tuple[str, datetime]] = {}
+# In-memory response cache: key -> (response, monotonic insert time), least recently used first
+RESPONSE_CACHE: "OrderedDict[str, Tuple[str, float]]" = OrderedDict()
+# Hit counts per cached key, used to keep popular answers through eviction
+RESPONSE_CACHE_HITS: Counter = Counter()
+# (insert time, key) in insertion order; with a single TTL this is also expiry order
+_RESPONSE_CACHE_EXPIRY: Deque[Tuple[float, str]] = deque()
+# cache_key -> in-flight generation shared by identical concurrent queries
+_INFLIGHT: Dict[str, "asyncio.Future[Tuple[str, List[str], str]]"] = {}
+
+@lru_cache(maxsize=4096)
+def _source_header(file_path: str, page: str) -> str:
+    """Citation line for a chunk; pages are re-cited across many requests."""
+    return f"[SOURCE: {document_name(file_path)} (Page: {page})]\n"
 
 def optimize_context_for_llm(chunks: list[dict], max_chunks: int = 3) -> str:
     """
     Take only the top most relevant chunks to include in the LLM prompt.
+    Chunk content is stripped at ingestion, so it is used as stored.
     """
     top_chunks = chunks[:max_chunks] 
-    context_parts = []
-    for chunk in top_chunks:
-        file_name = os.path.basename(chunk['file_path'])
-        pdf_page = chunk.get("display_page_number", "?")
-        context_parts.append(f"[SOURCE: {file_name} (Page: {pdf_page})]\n{chunk['content'].strip()}")
-    return "\n\n".join(context_parts)
+    return "\n\n".join(
+        _source_header(chunk['file_path'], chunk.get("display_page_number", "?")) + chunk['content']
+        for chunk in top_chunks
+    )
+
+def estimate_tokens(text: str) -> int:
+    """Cheap local token estimate (~4 characters per token), no API call."""
+    return (len(text) + 3) // 4
 
 def _generate_cache_key(query: str, case_data: str) -> str:
     """Generate a cache key from query and case data."""
-    combined = f"{query}|{case_data}".lower().strip()
-    return hashlib.md5(combined.encode()).hexdigest()
+    h = hashlib.blake2b(digest_size=16)
+    h.update(query.lower().strip().encode())
+    h.update(b"|")
+    h.update(case_data.lower().strip().encode())
+    return h.hexdigest()
 
 def _get_cached_response(cache_key: str) -> str:
     """Get cached response if available and not expired."""
-    if cache_key in RESPONSE_CACHE:
-        response, timestamp = RESPONSE_CACHE[cache_key]
-        if datetime.now() - timestamp < timedelta(minutes=CACHE_TTL_MINUTES):
-            logger.info(f"Cache HIT - Returning cached response (age: {(datetime.now() - timestamp).seconds}s)")
+    cached = RESPONSE_CACHE.get(cache_key)
+    if cached is not None:
+        response, timestamp = cached
+        age = time.monotonic() - timestamp
+        if age < CACHE_TTL_MINUTES * 60:
+            RESPONSE_CACHE.move_to_end(cache_key)
+            RESPONSE_CACHE_HITS[cache_key] += 1
+            logger.info(f"Cache HIT - Returning cached response (age: {int(age)}s)")
             return response
-        else:
-            # Expired, remove from cache
-            del RESPONSE_CACHE[cache_key]
-            logger.info("Cache EXPIRED - Will generate new response")
+        # Expired, remove from cache
+        _drop_cached_response(cache_key)
+        logger.info("Cache EXPIRED - Will generate new response")
     return None
 
+def _drop_cached_response(cache_key: str):
+    """Remove a key and its hit count."""
+    RESPONSE_CACHE.pop(cache_key, None)
+    RESPONSE_CACHE_HITS.pop(cache_key, None)
+
+def _reap_expired_responses(now: float):
+    """Drop expired entries from the front of the expiry queue (amortised O(1))."""
+    ttl = CACHE_TTL_MINUTES * 60
+    while _RESPONSE_CACHE_EXPIRY and now - _RESPONSE_CACHE_EXPIRY[0][0] >= ttl:
+        inserted_at, key = _RESPONSE_CACHE_EXPIRY.popleft()
+        cached = RESPONSE_CACHE.get(key)
+        # Skip keys that were re-cached after this queue entry was written
+        if cached is not None and cached[1] == inserted_at:
+            _drop_cached_response(key)
+
+def _evict_one_response(now: float):
+    """
+    Evict one entry, sampling the least recently used few and dropping the
+    one with the fewest hits relative to its age (LRU + LFU + TTL).
+    """
+    ttl = CACHE_TTL_MINUTES * 60
+    candidates = itertools.islice(RESPONSE_CACHE.items(), CACHE_EVICTION_SAMPLE_SIZE)
+    victim = min(
+        candidates,
+        key=lambda item: RESPONSE_CACHE_HITS[item[0]] / (1 + (now - item[1][1]) / ttl)
+    )[0]
+    _drop_cached_response(victim)
+
 def _cache_response(cache_key: str, response: str):
     """Cache a response with timestamp."""
-    RESPONSE_CACHE[cache_key] = (response, datetime.now())
+    now = time.monotonic()
+    
+    # Make room first so the new entry is never its own eviction candidate
+    if cache_key not in RESPONSE_CACHE:
+        while len(RESPONSE_CACHE) >= MAX_CACHE_SIZE:
+            _evict_one_response(now)
+    
+    RESPONSE_CACHE[cache_key] = (response, now)
+    RESPONSE_CACHE.move_to_end(cache_key)
+    _RESPONSE_CACHE_EXPIRY.append((now, cache_key))
     logger.info(f"Response cached (cache size: {len(RESPONSE_CACHE)} entries)")
+
+async def run_cache_sweeper(interval: float = CACHE_SWEEP_INTERVAL_SECONDS):
+    """Periodically drop expired response and semantic cache entries off the request path."""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            _reap_expired_responses(time.monotonic())
+            semantic_cache.purge_expired()
+        except Exception as e:
+            logger.warning(f"Cache sweep failed: {e}")
+
+# OPTIMIZED_PROMPT split around its {sources} and {context} slots once at import,
+# so each request joins static pieces instead of re-parsing the template
+_PROMPT_HEAD, _PROMPT_REST = OPTIMIZED_PROMPT.split("{sources}")
+_PROMPT_MID, _PROMPT_TAIL = _PROMPT_REST.split("{context}")
+_PROMPT_STATIC_TOKENS = estimate_tokens(_PROMPT_HEAD + _PROMPT_MID + _PROMPT_TAIL)
+
+# Trips after repeated upstream failures so requests fail fast instead of piling on
+genai_circuit = CircuitBreaker("GenAI")
+SERVICE_UNAVAILABLE_MESSAGE = "⚠️ The AI service is temporarily unavailable. Please try again shortly."
+
+
+def _record_model_outcome(error: Exception):
+    """Count 5xx, rate-limit and transport errors against the circuit; other errors mean the service answered."""
+    # Already loaded by the time a model call fails, so this is a sys.modules lookup
+    from google.genai import errors as genai_errors
+    
+    if isinstance(error, genai_errors.ServerError) \
+            or (isinstance(error, genai_errors.APIError) and error.code == 429) \
+            or isinstance(error, (httpx.TransportError, asyncio.TimeoutError)):
+        genai_circuit.record_failure()
+    else:
+        genai_circuit.record_success()
+
+# Sampling settings shared by blocking and streaming generation
+GENERATION_CONFIG = {
+    "temperature": 0.2,
+    "max_output_tokens": 2000,
+    "top_p": 0.95,
+    "top_k": 20,
+    "candidate_count": 1
+}
+
+TRUNCATED_NOTE = "\n\n**[Note: The response was truncated due to token limits. Try asking a more specific question.]**"
+FILTERED_NOTE = "\n\n**[Note: Some content was filtered for safety or duplication.]**"
+
+
+def _finish_reason_note(finish_reason) -> str:
+    """Footnote to append for a truncated or filtered generation."""
+    if finish_reason == 'MAX_TOKENS':
+        return TRUNCATED_NOTE
+    if finish_reason in ['SAFETY', 'RECITATION']:
+        return FILTERED_NOTE
+    return ""
+
+
+async def _lookup_cached(query: str, chat_history: str, case_data: str):
+    """
+    Check the exact and semantic caches for a history-free query.
+
+    Returns:
+        (cache_key, query_embedding, hit) where hit is (response, sources) or None.
+        cache_key is None when the query has chat history and must not be cached.
+    """
+    if chat_history and chat_history != "No previous conversation":
+        return None, None, None
     
-    # Cleanup old entries if cache gets too large
-    if len(RESPONSE_CACHE) > MAX_CACHE_SIZE:
-        # Remove oldest entries
-        sorted_keys = sorted(RESPONSE_CACHE.keys(), key=lambda k: RESPONSE_CACHE[k][1])
-        for key in sorted_keys[:20]:  # Remove 20 oldest
-            del RESPONSE_CACHE[key]
-        logger.info(f"🧹 Cache cleanup - Removed 20 oldest entries")
+    cache_key = _generate_cache_key(query, case_data)
+    cached_response = _get_cached_response(cache_key)
+    if cached_response:
+        return cache_key, None, (cached_response, [])
+    
+    # Fall back to a semantic match on rephrasings of earlier questions
+    query_embedding = None
+    try:
+        query_embedding = await asyncio.to_thread(embed_search_query, query, case_data)
+    except Exception as e:
+        logger.warning(f"Could not embed query for semantic cache: {e}")
+    if query_embedding is not None:
+        semantic_hit = semantic_cache.get(query_embedding)
+        if semantic_hit:
+            cached_response, cached_sources = semantic_hit
+            # Promote to the exact-match cache so a verbatim repeat skips embedding
+            _cache_response(cache_key, cached_response)
+            return cache_key, query_embedding, (cached_response, cached_sources)
+    return cache_key, query_embedding, None
+
+
+async def _build_prompt(query: str, chat_history: str, case_data: str, query_embedding=None) -> Tuple[str, List[str]]:
+    """Retrieve context and assemble the full prompt. Returns (prompt, sources)."""
+    # Retrieval runs in a worker thread while the user block is assembled
+    retrieval_task = asyncio.create_task(asyncio.to_thread(
+        search_all_collections, query, case_data, 3, query_embedding
+    ))
+    user_context_block = f"""
+        ### USER QUESTION:
+        {query}
+
+        ### CONTEXT (if provided):
+        {case_data or 'No additional context provided.'}
+
+        ### PREVIOUS CONVERSATION SUMMARY:
+        {chat_history or 'No previous conversation.'}
+        """.strip()
+
+    context, actual_sources = await retrieval_task
+    optimized_context = optimize_context_for_llm(context, max_chunks=3)
+    logger.info(f"Context optimized: {len(context)} -> {len(optimized_context)} chars")
+
+    sources_text = ", ".join(actual_sources) if actual_sources else "No sources available"
+    
+    # Keep the prompt under the model budget by trimming retrieved context
+    overflow = _PROMPT_STATIC_TOKENS + estimate_tokens(sources_text) + estimate_tokens(user_context_block) \
+        + estimate_tokens(optimized_context) - PROMPT_TOKEN_LIMIT
+    if overflow > 0:
+        logger.warning(f"Prompt over token budget by ~{overflow} tokens, trimming context")
+        optimized_context = optimized_context[:max(0, len(optimized_context) - overflow * 4)]
+    
+    full_prompt = "".join((
+        _PROMPT_HEAD, sources_text, _PROMPT_MID, optimized_context, _PROMPT_TAIL, "\n\n", user_context_block
+    ))
+
+    logger.info(f"--- PROMPT SENT TO API (first 500 chars) ---\n{full_prompt[:500]}\n...")
+    return full_prompt, actual_sources
+
+
+def _remember_response(cache_key: str, query_embedding, response_text: str, sources: List[str]):
+    """Store a finished answer in the exact and semantic caches."""
+    if cache_key and response_text:
+        _cache_response(cache_key, response_text)
+        if query_embedding is not None:
+            semantic_cache.set(query_embedding, (response_text, sources))
+
 
 @retry(
-    stop=stop_after_attempt(3),
-    wait=wait_exponential(multiplier=1, min=4, max=10),
+    stop=stop_after_attempt(MAX_RETRY_ATTEMPTS),
+    # Jitter spreads out retries so failing requests do not hit the API in lockstep
+    wait=wait_exponential_jitter(initial=RETRY_MIN_WAIT, max=RETRY_MAX_WAIT, jitter=2),
     reraise=True,
-    retry=retry_if_not_exception_type(HTTPException)
+    retry=retry_if_not_exception_type((HTTPException, CircuitOpenError))
 )
 async def generate_response(query: str, chat_history: str, case_data: str) -> Tuple[str, List[str], str]:
     
-    total_start_time = time.time()
-    full_response_text = ""  
+    total_start_time = time.perf_counter()
     actual_sources = []
     
     try:
         # Check cache first (skip for queries with chat history)
-        cache_key = None
-        if not chat_history or chat_history == "No previous conversation":
-            cache_key = _generate_cache_key(query, case_data)
-            cached_response = _get_cached_response(cache_key)
-            if cached_response:
-                logger.info(f"⚡ Cached response returned in {time.time() - total_start_time:.3f}s")
-                return cached_response, [], "success"
-        
-        context, actual_sources = search_all_collections(query, case_data, k=3)
-        optimized_context = optimize_context_for_llm(context, max_chunks=3)
-        logger.info(f"Context optimized: {len(context)} -> {len(optimized_context)} chars")
-
-        sources_text = ", ".join(actual_sources) if actual_sources else "No sources available"
-        
-        full_prompt = OPTIMIZED_PROMPT.format(sources=sources_text, context=optimized_context)
-        user_context_block = f"""
-            ### USER QUESTION:
-            {query}
-
-            ### CONTEXT (if provided):
-            {case_data or 'No additional context provided.'}
-
-            ### PREVIOUS CONVERSATION SUMMARY:
-            {chat_history or 'No previous conversation.'}
-            """
-        full_prompt += f"\n\n{user_context_block.strip()}"
-
-        logger.info(f"--- PROMPT SENT TO API (first 500 chars) ---\n{full_prompt[:500]}\n...")
-
-        # Get the GenAI client
-        client = get_genai_client()
-
-        # Generate the response
-        llm_start = time.time()
-        logger.info("Generating response from model...")
+        cache_key, query_embedding, hit = await _lookup_cached(query, chat_history, case_data)
+        if hit:
+            logger.info(f"⚡ Cached response returned in {time.perf_counter() - total_start_time:.3f}s")
+            return hit[0], hit[1], "success"
 
-        try:
-            response = client.models.generate_content(
-                model=MODEL_NAME,
-                contents=[{"role": "user", "parts": [{"text": full_prompt}]}],
-                config={
-                    "temperature": 0.2,
-                    "max_output_tokens": 2000,
-                    "top_p": 0.95,
-                    "top_k": 20,
-                    "candidate_count": 1
-                }
+        if not cache_key:
+            return await _generate_uncached(query, chat_history, case_data, None, None, total_start_time)
+
+        # Identical queries arriving together share one generation
+        inflight = _INFLIGHT.get(cache_key)
+        if inflight is None:
+            inflight = asyncio.ensure_future(
+                _generate_uncached(query, chat_history, case_data, cache_key, query_embedding, total_start_time)
             )
-        except Exception as e:
-            logger.error(f"Failed to generate content: {e}", exc_info=True)
-            return f"⚠️ Failed to generate content: {str(e)}", actual_sources, "error"
+            _INFLIGHT[cache_key] = inflight
+            inflight.add_done_callback(lambda _: _INFLIGHT.pop(cache_key, None))
+        else:
+            logger.info("Joining in-flight generation for an identical query")
+        # Shielded so one cancelled caller does not cancel it for the others
+        return await asyncio.shield(inflight)
 
-        # Process model output
-        try:
-            if response and hasattr(response, 'candidates') and response.candidates:
-                candidate = response.candidates[0]
+    except Exception as e:
+        logger.error(f"FATAL error in generate_response: {e}", exc_info=True)
+        return f"🚨 Unexpected error: {str(e)}", actual_sources, "error"
 
-                if not (hasattr(candidate, 'content') and hasattr(candidate.content, 'parts') and candidate.content.parts):
-                    logger.error("Empty or blocked response (no content parts).")
-                    return "⚠️ The content was blocked. Please rephrase your question.", actual_sources, "error"
 
-                full_response_text = candidate.content.parts[0].text.strip()
-                finish_reason = getattr(candidate, 'finish_reason', 'UNKNOWN')
-                logger.info(f"Response finish reason: {finish_reason}")
+async def _generate_uncached(
+    query: str, chat_history: str, case_data: str, cache_key, query_embedding, total_start_time: float
+) -> Tuple[str, List[str], str]:
+    """Retrieve, prompt and call the model, then cache the answer."""
+    full_response_text = ""
+    full_prompt, actual_sources = await _build_prompt(query, chat_history, case_data, query_embedding)
 
-                if finish_reason == 'MAX_TOKENS':
-                    full_response_text += "\n\n**[Note: The response was truncated due to token limits. Try asking a more specific question.]**"
-                elif finish_reason in ['SAFETY', 'RECITATION']:
-                    full_response_text += "\n\n**[Note: Some content was filtered for safety or duplication.]**"
+    # Get the GenAI client
+    client = get_genai_client()
 
-            else:
-                logger.error("Model returned no candidates or empty response.")
-                return "⚠️ No valid response was generated. Please try again.", actual_sources, "error"
+    # Generate the response
+    llm_start = time.perf_counter()
+    logger.info("Generating response from model...")
 
-        except Exception as e:
-            logger.error(f"Error processing model output: {e}", exc_info=True)
-            return f"An error occurred while processing the response: {str(e)}", actual_sources, "error"
+    try:
+        genai_circuit.before_call()
+    except CircuitOpenError:
+        logger.warning("GenAI circuit open - skipping model call")
+        return SERVICE_UNAVAILABLE_MESSAGE, actual_sources, "error"
+
+    try:
+        response = await client.aio.models.generate_content(
+            model=MODEL_NAME,
+            contents=[{"role": "user", "parts": [{"text": full_prompt}]}],
+            config=GENERATION_CONFIG
+        )
+    except Exception as e:
+        _record_model_outcome(e)
+        logger.error(f"Failed to generate content: {e}", exc_info=True)
+        return f"⚠️ Failed to generate content: {str(e)}", actual_sources, "error"
+    except BaseException:
+        # Cancelled (e.g. client disconnect); says nothing about upstream health,
+        # but a half-open trial slot must be freed or the breaker never closes
+        genai_circuit.release()
+        raise
+    genai_circuit.record_success()
+
+    # Process model output
+    try:
+        if response and hasattr(response, 'candidates') and response.candidates:
+            candidate = response.candidates[0]
 
-        # Cache the response for future use
-        if cache_key and full_response_text:
-            _cache_response(cache_key, full_response_text)
+            if not (hasattr(candidate, 'content') and hasattr(candidate.content, 'parts') and candidate.content.parts):
+                logger.error("Empty or blocked response (no content parts).")
+                return "⚠️ The content was blocked. Please rephrase your question.", actual_sources, "error"
 
-        logger.info(f"✅ Response generated successfully in {time.time() - llm_start:.3f}s")
-        logger.info(f"Full pipeline completed in {time.time() - total_start_time:.3f}s")
+            full_response_text = candidate.content.parts[0].text.strip()
+            finish_reason = getattr(candidate, 'finish_reason', 'UNKNOWN')
+            logger.info(f"Response finish reason: {finish_reason}")
+            full_response_text += _finish_reason_note(finish_reason)
 
-        return full_response_text, actual_sources, "success"
+        else:
+            logger.error("Model returned no candidates or empty response.")
+            return "⚠️ No valid response was generated. Please try again.", actual_sources, "error"
 
     except Exception as e:
-        logger.error(f"FATAL error in generate_response: {e}", exc_info=True)
-        return f"🚨 Unexpected error: {str(e)}", actual_sources, "error"
+        logger.error(f"Error processing model output: {e}", exc_info=True)
+        return f"An error occurred while processing the response: {str(e)}", actual_sources, "error"
+
+    # Cache the response for future use
+    _remember_response(cache_key, query_embedding, full_response_text, actual_sources)
+
+    logger.info(f"✅ Response generated successfully in {time.perf_counter() - llm_start:.3f}s")
+    logger.info(f"Full pipeline completed in {time.perf_counter() - total_start_time:.3f}s")
+
+    return full_response_text, actual_sources, "success"
+
+
+async def stream_response(query: str, chat_history: str, case_data: str) -> Tuple[List[str], AsyncIterator[str]]:
+    """
+    Prepare a streamed answer.
+
+    Cache lookup and retrieval finish before this returns so the sources are
+    known up front; the returned iterator then yields text as the model
+    produces it and caches the full answer once the stream completes.
+
+    Returns:
+        (sources, chunks)
+    """
+    start_time = time.perf_counter()
+    cache_key, query_embedding, hit = await _lookup_cached(query, chat_history, case_data)
+    if hit:
+        logger.info(f"⚡ Cached response returned in {time.perf_counter() - start_time:.3f}s")
+
+        async def replay() -> AsyncIterator[str]:
+            yield hit[0]
+
+        return hit[1], replay()
+
+    full_prompt, sources = await _build_prompt(query, chat_history, case_data, query_embedding)
+    client = get_genai_client()
+
+    async def chunks() -> AsyncIterator[str]:
+        parts = []
+        finish_reason = None
+        genai_circuit.before_call()
+        try:
+            stream = await client.aio.models.generate_content_stream(
+                model=MODEL_NAME,
+                contents=[{"role": "user", "parts": [{"text": full_prompt}]}],
+                config=GENERATION_CONFIG
+            )
+            async for chunk in stream:
+                if chunk.candidates:
+                    finish_reason = chunk.candidates[0].finish_reason or finish_reason
+                text = chunk.text
+                if text:
+                    parts.append(text)
+                    yield text
+        except Exception as e:
+            _record_model_outcome(e)
+            raise
+        except BaseException:
+            # Client went away mid-stream; says nothing about upstream health
+            genai_circuit.release()
+            raise
+        genai_circuit.record_success()
+
+        note = _finish_reason_note(finish_reason)
+        if note:
+            parts.append(note)
+            yield note
+
+        full_response_text = "".join(parts).strip()
+        _remember_response(cache_key, query_embedding, full_response_text, sources)
+        logger.info(f"✅ Streamed response completed in {time.perf_counter() - start_time:.3f}s (finish reason: {finish_reason})")
+
+    return sources, chunks()
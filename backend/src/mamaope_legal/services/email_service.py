@@ -4,17 +4,88 @@ Handles email verification and notifications.
 """
 
 import logging
+import queue
 import smtplib
 import ssl
+from concurrent.futures import ThreadPoolExecutor
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from typing import Optional
 import os
 import secrets
-import string
+from string import Template
 
 logger = logging.getLogger(__name__)
 
+# Email bodies; $app_name is filled in once per service, the rest per message
+VERIFY_HTML = Template("""\
+<html>
+<body>
+    <h2>Welcome to $app_name!</h2>
+    <p>Hello $username,</p>
+    <p>Thank you for registering with $app_name. Please verify your email address by clicking the link below:</p>
+    <p><a href="$url" style="background-color: #4CAF50; color: white; padding: 10px 20px; text-decoration: none; border-radius: 5px;">Verify Email Address</a></p>
+    <p>Or copy and paste this link into your browser:</p>
+    <p>$url</p>
+    <p>This link will expire in 24 hours.</p>
+    <p>If you didn't create an account with $app_name, please ignore this email.</p>
+    <br>
+    <p>Best regards,<br>The $app_name Team</p>
+</body>
+</html>
+""")
+
+VERIFY_TEXT = Template("""\
+Welcome to $app_name!
+
+Hello $username,
+
+Thank you for registering with $app_name. Please verify your email address by visiting the link below:
+
+$url
+
+This link will expire in 24 hours.
+
+If you didn't create an account with $app_name, please ignore this email.
+
+Best regards,
+The $app_name Team
+""")
+
+RESET_HTML = Template("""\
+<html>
+<body>
+    <h2>Password Reset Request</h2>
+    <p>Hello $username,</p>
+    <p>You requested a password reset for your $app_name account. Click the link below to reset your password:</p>
+    <p><a href="$url" style="background-color: #f44336; color: white; padding: 10px 20px; text-decoration: none; border-radius: 5px;">Reset Password</a></p>
+    <p>Or copy and paste this link into your browser:</p>
+    <p>$url</p>
+    <p>This link will expire in 1 hour.</p>
+    <p>If you didn't request a password reset, please ignore this email.</p>
+    <br>
+    <p>Best regards,<br>The $app_name Team</p>
+</body>
+</html>
+""")
+
+RESET_TEXT = Template("""\
+Password Reset Request
+
+Hello $username,
+
+You requested a password reset for your $app_name account. Visit the link below to reset your password:
+
+$url
+
+This link will expire in 1 hour.
+
+If you didn't request a password reset, please ignore this email.
+
+Best regards,
+The $app_name Team
+""")
+
 
 class EmailService:
     """Service for sending emails."""
@@ -28,6 +99,22 @@ class EmailService:
         self.app_name = os.getenv("APP_NAME", "mamaope_legal AI CDSS")
         self.base_url = os.getenv("BASE_URL", "http://localhost:8050")
         
+        # Bake the static app name into each body so a send only fills in user fields
+        app_name = self.app_name.replace("$", "$$")
+        self._templates = {
+            name: Template(template.safe_substitute(app_name=app_name))
+            for name, template in (
+                ("VERIFY_HTML", VERIFY_HTML), ("VERIFY_TEXT", VERIFY_TEXT),
+                ("RESET_HTML", RESET_HTML), ("RESET_TEXT", RESET_TEXT),
+            )
+        }
+        
+        # Authenticated SMTP connections kept open between sends
+        self.pool_size = int(os.getenv("SMTP_POOL_SIZE", "4"))
+        self._pool: "queue.LifoQueue[smtplib.SMTP]" = queue.LifoQueue(maxsize=self.pool_size)
+        self._tls_context = ssl.create_default_context()
+        self._connector = ThreadPoolExecutor(max_workers=self.pool_size, thread_name_prefix="smtp-connect")
+        
         # Check if email is configured
         if not self.sender_email or not self.sender_password:
             logger.warning("Email service not configured - SMTP credentials missing")
@@ -38,10 +125,73 @@ class EmailService:
             self.is_configured = True
             logger.info(f"Email service configured with {self.sender_email}")
     
+    def _connect(self) -> smtplib.SMTP:
+        """Open a new SMTP connection and log in."""
+        server = smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=30)
+        try:
+            server.starttls(context=self._tls_context)
+            server.login(self.sender_email, self.sender_password)
+        except Exception:
+            server.close()
+            raise
+        return server
+    
+    def _release(self, server: smtplib.SMTP):
+        """Return a healthy connection to the pool, closing it if the pool is full."""
+        try:
+            self._pool.put_nowait(server)
+        except queue.Full:
+            self._close(server)
+    
+    @staticmethod
+    def _close(server: smtplib.SMTP):
+        """Close a connection, ignoring errors from an already dropped socket."""
+        try:
+            server.quit()
+        except Exception:
+            server.close()
+    
+    def _send(self, recipient: str, message: MIMEMultipart):
+        """Send a message over a pooled connection, reconnecting once if it went stale."""
+        try:
+            server = self._pool.get_nowait()
+        except queue.Empty:
+            # Serialise the message while the handshake and login run on another thread
+            connecting = self._connector.submit(self._connect)
+            try:
+                payload = message.as_string()
+            except Exception:
+                connecting.add_done_callback(lambda f: f.exception() or self._release(f.result()))
+                raise
+            server = connecting.result()
+        else:
+            try:
+                payload = message.as_string()
+            except Exception:
+                # The connection was never used, so it goes straight back to the pool
+                self._release(server)
+                raise
+
+        try:
+            server.sendmail(self.sender_email, recipient, payload)
+        except (smtplib.SMTPServerDisconnected, ConnectionError):
+            # Idle pooled connections are dropped by the server; retry on a fresh one
+            server.close()
+            server = self._connect()
+            try:
+                server.sendmail(self.sender_email, recipient, payload)
+            except Exception:
+                self._close(server)
+                raise
+        except Exception:
+            self._close(server)
+            raise
+        self._release(server)
+    
     def generate_verification_token(self, length: int = 32) -> str:
         """Generate a secure verification token."""
-        alphabet = string.ascii_letters + string.digits
-        return ''.join(secrets.choice(alphabet) for _ in range(length))
+        # One urandom read; base64url output is safe to embed in the link
+        return secrets.token_urlsafe((length * 3 + 3) // 4)[:length]
     
     def send_verification_email(self, email: str, username: str, verification_token: str) -> bool:
         """Send email verification email."""
@@ -56,39 +206,9 @@ class EmailService:
             # Create email content
             subject = f"Verify Your Email - {self.app_name}"
             
-            html_content = f"""
-            <html>
-            <body>
-                <h2>Welcome to {self.app_name}!</h2>
-                <p>Hello {username},</p>
-                <p>Thank you for registering with {self.app_name}. Please verify your email address by clicking the link below:</p>
-                <p><a href="{verification_url}" style="background-color: #4CAF50; color: white; padding: 10px 20px; text-decoration: none; border-radius: 5px;">Verify Email Address</a></p>
-                <p>Or copy and paste this link into your browser:</p>
-                <p>{verification_url}</p>
-                <p>This link will expire in 24 hours.</p>
-                <p>If you didn't create an account with {self.app_name}, please ignore this email.</p>
-                <br>
-                <p>Best regards,<br>The {self.app_name} Team</p>
-            </body>
-            </html>
-            """
-            
-            text_content = f"""
-            Welcome to {self.app_name}!
-            
-            Hello {username},
+            html_content = self._templates["VERIFY_HTML"].substitute(username=username, url=verification_url)
             
-            Thank you for registering with {self.app_name}. Please verify your email address by visiting the link below:
-            
-            {verification_url}
-            
-            This link will expire in 24 hours.
-            
-            If you didn't create an account with {self.app_name}, please ignore this email.
-            
-            Best regards,
-            The {self.app_name} Team
-            """
+            text_content = self._templates["VERIFY_TEXT"].substitute(username=username, url=verification_url)
             
             # Create message
             message = MIMEMultipart("alternative")
@@ -104,11 +224,7 @@ class EmailService:
             message.attach(html_part)
             
             # Send email
-            context = ssl.create_default_context()
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                server.starttls(context=context)
-                server.login(self.sender_email, self.sender_password)
-                server.sendmail(self.sender_email, email, message.as_string())
+            self._send(email, message)
             
             logger.info(f"Verification email sent to {email}")
             return True
@@ -130,39 +246,9 @@ class EmailService:
             # Create email content
             subject = f"Password Reset - {self.app_name}"
             
-            html_content = f"""
-            <html>
-            <body>
-                <h2>Password Reset Request</h2>
-                <p>Hello {username},</p>
-                <p>You requested a password reset for your {self.app_name} account. Click the link below to reset your password:</p>
-                <p><a href="{reset_url}" style="background-color: #f44336; color: white; padding: 10px 20px; text-decoration: none; border-radius: 5px;">Reset Password</a></p>
-                <p>Or copy and paste this link into your browser:</p>
-                <p>{reset_url}</p>
-                <p>This link will expire in 1 hour.</p>
-                <p>If you didn't request a password reset, please ignore this email.</p>
-                <br>
-                <p>Best regards,<br>The {self.app_name} Team</p>
-            </body>
-            </html>
-            """
-            
-            text_content = f"""
-            Password Reset Request
-            
-            Hello {username},
-            
-            You requested a password reset for your {self.app_name} account. Visit the link below to reset your password:
-            
-            {reset_url}
-            
-            This link will expire in 1 hour.
-            
-            If you didn't request a password reset, please ignore this email.
+            html_content = self._templates["RESET_HTML"].substitute(username=username, url=reset_url)
             
-            Best regards,
-            The {self.app_name} Team
-            """
+            text_content = self._templates["RESET_TEXT"].substitute(username=username, url=reset_url)
             
             # Create message
             message = MIMEMultipart("alternative")
@@ -178,11 +264,7 @@ class EmailService:
             message.attach(html_part)
             
             # Send email
-            context = ssl.create_default_context()
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
-                server.starttls(context=context)
-                server.login(self.sender_email, self.sender_password)
-                server.sendmail(self.sender_email, email, message.as_string())
+            self._send(email, message)
             
             logger.info(f"Password reset email sent to {email}")
             return True
@@ -4,12 +4,20 @@ This module handles the initialization of the Google GenAI client once at startu
 """
 import os
 import logging
+import threading
+import time
 import traceback
-from google import genai
-from google.auth import load_credentials_from_file
-import vertexai
+from functools import lru_cache
+from importlib.util import find_spec
+from typing import TYPE_CHECKING
+import httpx
 from dotenv import load_dotenv
 
+from mamaope_legal.core.constants import GENAI_INIT_RETRY_SECONDS
+
+if TYPE_CHECKING:
+    from google.genai import types
+
 # Load environment variables
 load_dotenv()
 
@@ -17,13 +25,70 @@ logger = logging.getLogger(__name__)
 
 # Global client instance
 _genai_client = None
+_init_lock = threading.Lock()
+# Monotonic time of the last background initialization attempt; guarded by its own
+# lock because get_genai_client runs on the event loop and must never wait on
+# _init_lock, which is held for the whole (network-bound) initialization
+_last_retry_at = None
+_retry_lock = threading.Lock()
+
+# Environment settings, read once after load_dotenv()
+_PROJECT_ID = os.getenv("GOOGLE_CLOUD_PROJECT") or os.getenv("GCP_ID")
+_LOCATION = os.getenv("GOOGLE_CLOUD_LOCATION") or os.getenv("GCP_LOCATION")
+_SA_FILE = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
+# Use us-central1 for better model availability
+_EFFECTIVE_LOCATION = 'us-central1' if _LOCATION == 'europe-west4' else _LOCATION
+
+CLOUD_PLATFORM_SCOPE = "https://www.googleapis.com/auth/cloud-platform"
+
+# Keep TLS connections to the Vertex endpoint alive between requests
+GENAI_HTTP_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=100, keepalive_expiry=60)
+
+
+def _http_options() -> "types.HttpOptions":
+    """Pooled transport settings; HTTP/2 multiplexing when the h2 package is installed."""
+    from google.genai import types
+    
+    http2 = find_spec("h2") is not None
+    if not http2:
+        logger.info("h2 not installed, GenAI client will use HTTP/1.1 keep-alive")
+    return types.HttpOptions(
+        client_args={"limits": GENAI_HTTP_LIMITS},
+        async_client_args={"http2": http2, "limits": GENAI_HTTP_LIMITS},
+    )
+
+@lru_cache(maxsize=4)
+def _load_credentials_cached(path: str, mtime_ns: int):
+    """Parse a service-account file once per (path, mtime)."""
+    from google.auth import load_credentials_from_file
+    
+    # Scoped up front so the same credentials work for vertexai.init and genai.Client
+    return load_credentials_from_file(path, scopes=[CLOUD_PLATFORM_SCOPE])
+
+
+def load_service_account_credentials(path: str):
+    """
+    Load (credentials, project_id) from a service-account file, reusing the
+    parsed result until the file changes on disk.
+    """
+    return _load_credentials_cached(path, os.stat(path).st_mtime_ns)
 
 def initialize_vertexai():
-    """Initialize Vertex AI with proper authentication."""
+    """
+    Initialize Vertex AI with proper authentication.
+    
+    Returns:
+        Credentials loaded from the service-account file, or None when using
+        application default credentials
+    """
+    # The Vertex SDK is a large import tree, only paid by processes that start the client
+    import vertexai
+    
+    credentials = None
     try:
-        project_id = os.getenv("GOOGLE_CLOUD_PROJECT") or os.getenv("GCP_ID")
-        location = os.getenv("GOOGLE_CLOUD_LOCATION") or os.getenv("GCP_LOCATION")
-        service_account_file = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
+        project_id = _PROJECT_ID
+        location = _LOCATION
+        service_account_file = _SA_FILE
         
         logger.info(f"Initializing Vertex AI with project: {project_id}, location: {location}")
         
@@ -32,7 +97,7 @@ def initialize_vertexai():
             
             if os.path.exists(service_account_file):
                 logger.info("Service account file exists, loading credentials...")
-                credentials, project_id = load_credentials_from_file(service_account_file)
+                credentials, project_id = load_service_account_credentials(service_account_file)
                 vertexai.init(project=project_id, location=location, credentials=credentials)
                 logger.info(f"Successfully loaded credentials from file for project: {project_id}")
             else:
@@ -44,6 +109,7 @@ def initialize_vertexai():
             vertexai.init(project=project_id, location=location)
             
         logger.info("Vertex AI initialization completed successfully")
+        return credentials
         
     except Exception as e:
         logger.error(f"Failed to initialize Vertex AI: {str(e)}")
@@ -56,36 +122,43 @@ def initialize_genai_client():
     """
     global _genai_client
     
+    if _genai_client is not None:
+        logger.debug("GenAI client already initialized")
+        return
+    
+    with _init_lock:
+        # Another thread may have finished initialization while we waited
+        if _genai_client is not None:
+            return
+        _initialize_genai_client_locked()
+
+def _initialize_genai_client_locked():
+    """Build the client; caller holds _init_lock."""
+    global _genai_client
+    
+    # Like vertexai, the GenAI SDK is only imported by processes that start the client
+    from google import genai
+    
     try:
-        # First initialize Vertex AI
-        initialize_vertexai()
+        # First initialize Vertex AI; reuse its credentials rather than letting the
+        # client resolve and parse the key file again
+        credentials = initialize_vertexai()
         
-        # Set environment variables for GenAI
-        project_id = os.getenv("GOOGLE_CLOUD_PROJECT") or os.getenv("GCP_ID")
-        location = os.getenv("GOOGLE_CLOUD_LOCATION") or os.getenv("GCP_LOCATION")
+        project_id = _PROJECT_ID
         
         if not project_id:
             raise ValueError("GOOGLE_CLOUD_PROJECT or GCP_ID environment variable is required")
         
-        # Set environment variables for GenAI to use Vertex AI
-        # Use us-central1 for better model availability
-        effective_location = 'us-central1' if location == 'europe-west4' else location
-        os.environ['GOOGLE_CLOUD_PROJECT'] = project_id
-        os.environ['GOOGLE_CLOUD_LOCATION'] = effective_location
-        os.environ['GOOGLE_GENAI_USE_VERTEXAI'] = 'True'
+        effective_location = _EFFECTIVE_LOCATION
         
-        # Get credentials from Vertex AI initialization
-        service_account_file = os.getenv("GOOGLE_APPLICATION_CREDENTIALS")
-        credentials = None
-        
-        if service_account_file and os.path.exists(service_account_file):
-            credentials, _ = load_credentials_from_file(service_account_file)
-        
-        # Initialize the GenAI client with Vertex AI configuration
+        # Initialize the GenAI client with Vertex AI configuration; everything is passed
+        # explicitly, so the process environment is left untouched
         _genai_client = genai.Client(
             vertexai=True,
             project=project_id,
-            location=effective_location
+            location=effective_location,
+            credentials=credentials,
+            http_options=_http_options()
         )
         
         logger.info(f"GenAI client initialized successfully for project {project_id} in {effective_location}")
@@ -101,10 +174,33 @@ def get_genai_client():
     global _genai_client
     
     if _genai_client is None:
+        # Startup init failed (e.g. credentials or metadata server unreachable); retry
+        # off the request path so the service recovers without a restart
+        _schedule_init_retry()
         raise RuntimeError("GenAI client not initialized. Call initialize_genai_client() first.")
     
     return _genai_client
 
+def _schedule_init_retry():
+    """Start a background initialization attempt, at most once per retry interval."""
+    global _last_retry_at
+    
+    with _retry_lock:
+        now = time.monotonic()
+        if _last_retry_at is not None and now - _last_retry_at < GENAI_INIT_RETRY_SECONDS:
+            return
+        _last_retry_at = now
+    
+    threading.Thread(target=_retry_initialization, name="genai-init-retry", daemon=True).start()
+
+def _retry_initialization():
+    """Thread target for a retry; failures are logged by the initializer."""
+    try:
+        initialize_genai_client()
+    except Exception:
+        # The next request after the retry interval schedules another attempt
+        pass
+
 def is_client_initialized():
     """
     Check if the GenAI client has been initialized.
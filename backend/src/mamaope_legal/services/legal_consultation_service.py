@@ -5,10 +5,10 @@ This module provides services for managing legal consultations and chat messages
 """
 
 import logging
-from datetime import datetime
 from typing import List, Optional, Dict, Any
-from sqlalchemy.orm import Session
-from sqlalchemy import desc, func
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import bindparam, case, delete, desc, exists, func, insert, literal, select, update
+from sqlalchemy.dialects.postgresql import aggregate_order_by
 
 from mamaope_legal.models.user import User
 from mamaope_legal.models.legal_consultation import LegalConsultation, ChatMessage
@@ -20,6 +20,83 @@ from mamaope_legal.schemas import (
 
 logger = logging.getLogger(__name__)
 
+# Speaker labels used when formatting chat history for the prompt
+_HISTORY_SPEAKERS = {"user": "Lawyer", "assistant": "AI Assistant"}
+
+# Columns that make up a ChatSessionResponse
+_SESSION_COLUMNS = (
+    LegalConsultation.id,
+    LegalConsultation.user_id,
+    LegalConsultation.session_name,
+    LegalConsultation.case_summary,
+    LegalConsultation.is_active,
+    LegalConsultation.created_at,
+    LegalConsultation.updated_at,
+    LegalConsultation.message_count
+)
+
+# Hot statements built once so SQLAlchemy's compiled cache is reused per call
+_STMT_GET_SESSION = select(*_SESSION_COLUMNS).where(
+    LegalConsultation.id == bindparam("sid"),
+    LegalConsultation.user_id == bindparam("uid")
+)
+# Session and its messages in one round trip (LEFT OUTER JOIN, messages ordered by id)
+_STMT_GET_SESSION_WITH_MESSAGES = select(LegalConsultation).options(
+    joinedload(LegalConsultation.chat_messages)
+).where(
+    LegalConsultation.id == bindparam("sid"),
+    LegalConsultation.user_id == bindparam("uid")
+)
+# Whole formatted history aggregated in PostgreSQL: one row back instead of one per message
+_STMT_HISTORY_TEXT = select(
+    func.string_agg(
+        case(_HISTORY_SPEAKERS, value=ChatMessage.message_type) + ": " + ChatMessage.content,
+        # Renders as string_agg(<line>, '\n' ORDER BY chat_messages.id)
+        aggregate_order_by(literal("\n"), ChatMessage.id)
+    )
+).where(
+    ChatMessage.session_id == bindparam("sid"),
+    ChatMessage.message_type.in_(list(_HISTORY_SPEAKERS)),
+    exists().where(
+        LegalConsultation.id == bindparam("sid"),
+        LegalConsultation.user_id == bindparam("uid")
+    )
+)
+# Ownership check, message counter and timestamp bump in one UPDATE ... RETURNING
+_STMT_TOUCH_SESSION = update(LegalConsultation).where(
+    LegalConsultation.id == bindparam("sid"),
+    LegalConsultation.user_id == bindparam("uid")
+).values(
+    message_count=LegalConsultation.message_count + bindparam("added"),
+    updated_at=func.now()
+).returning(LegalConsultation.id)
+_STMT_DELETE_SESSION_MESSAGES = delete(ChatMessage).where(
+    ChatMessage.session_id == bindparam("sid"),
+    exists().where(
+        LegalConsultation.id == bindparam("sid"),
+        LegalConsultation.user_id == bindparam("uid")
+    )
+).execution_options(synchronize_session=False)
+_STMT_DELETE_SESSION = delete(LegalConsultation).where(
+    LegalConsultation.id == bindparam("sid"),
+    LegalConsultation.user_id == bindparam("uid")
+).execution_options(synchronize_session=False)
+_STMT_INSERT_SESSION = insert(LegalConsultation).returning(
+    LegalConsultation.id, LegalConsultation.created_at, LegalConsultation.updated_at
+)
+# Rows come back in parameter order, so multi-message inserts map ids to their inputs
+_STMT_INSERT_MESSAGE = insert(ChatMessage).returning(
+    ChatMessage.id, ChatMessage.created_at, sort_by_parameter_order=True
+)
+_STMT_COUNT_SESSIONS = select(func.count(LegalConsultation.id)).where(
+    LegalConsultation.user_id == bindparam("uid")
+)
+_STMT_LIST_SESSIONS = select(*_SESSION_COLUMNS).where(
+    LegalConsultation.user_id == bindparam("uid")
+).order_by(
+    desc(LegalConsultation.updated_at)
+).limit(bindparam("limit")).offset(bindparam("offset"))
+
 
 class LegalConsultationService:
     """Service for managing legal consultations and chat messages."""
@@ -30,110 +107,66 @@ class LegalConsultationService:
     def create_session(self, user: User, session_data: ChatSessionCreate) -> ChatSessionResponse:
         """Create a new legal consultation session."""
         try:
-            # Create new session
-            new_session = LegalConsultation(
-                user_id=user.id,
-                session_name=session_data.session_name,
-                case_summary=session_data.case_summary,
-                is_active=True,
-                created_at=datetime.utcnow().isoformat(),
-                updated_at=datetime.utcnow().isoformat()
-            )
+            # Create new session, reading server-generated columns back from the INSERT
+            session_id, created_at, updated_at = self.db.execute(
+                _STMT_INSERT_SESSION,
+                {
+                    "user_id": user.id,
+                    "session_name": session_data.session_name,
+                    "case_summary": session_data.case_summary,
+                    "is_active": True
+                }
+            ).one()
             
-            self.db.add(new_session)
             self.db.commit()
-            self.db.refresh(new_session)
             
-            logger.info(f"Created new legal consultation session {new_session.id} for user {user.id}")
+            logger.info("Created new legal consultation session %s for user %s", session_id, user.id)
             
             return ChatSessionResponse(
-                id=new_session.id,
-                user_id=new_session.user_id,
-                session_name=new_session.session_name,
+                id=session_id,
+                user_id=user.id,
+                session_name=session_data.session_name,
                 case_summary=session_data.case_summary,
-                is_active=new_session.is_active,
-                created_at=new_session.created_at,
-                updated_at=new_session.updated_at,
+                is_active=True,
+                created_at=created_at,
+                updated_at=updated_at,
                 message_count=0
             )
             
         except Exception as e:
-            logger.error(f"Error creating legal consultation session: {e}")
+            logger.error("Error creating legal consultation session: %s", e)
             self.db.rollback()
             raise
     
     def get_session(self, session_id: int, user: User) -> Optional[ChatSessionResponse]:
         try:
-            session = self.db.query(LegalConsultation).filter(
-                LegalConsultation.id == session_id,
-                LegalConsultation.user_id == user.id
-            ).first()
+            session = self.db.execute(
+                _STMT_GET_SESSION, {"sid": session_id, "uid": user.id}
+            ).one_or_none()
             
             if not session:
                 return None
             
-            # Get message count
-            message_count = self.db.query(func.count(ChatMessage.id)).filter(
-                ChatMessage.session_id == session.id
-            ).scalar()
-            
-            return ChatSessionResponse(
-                id=session.id,
-                user_id=session.user_id,
-                session_name=session.session_name,
-                case_summary=session.case_summary,
-                is_active=session.is_active,
-                created_at=session.created_at,
-                updated_at=session.updated_at,
-                message_count=message_count or 0
-            )
+            return ChatSessionResponse.model_validate(session)
             
         except Exception as e:
-            logger.error(f"Error getting case session {session_id}: {e}")
+            logger.error("Error getting case session %s: %s", session_id, e)
             raise
     
     def get_session_with_messages(self, session_id: int, user: User) -> Optional[ChatSessionWithMessages]:
         try:
-            session = self.db.query(LegalConsultation).filter(
-                LegalConsultation.id == session_id,
-                LegalConsultation.user_id == user.id
-            ).first()
+            session = self.db.execute(
+                _STMT_GET_SESSION_WITH_MESSAGES, {"sid": session_id, "uid": user.id}
+            ).unique().scalar_one_or_none()
             
             if not session:
                 return None
             
-            # Get messages ordered by creation time
-            messages = self.db.query(ChatMessage).filter(
-                ChatMessage.session_id == session.id
-            ).order_by(ChatMessage.id.asc()).all()
-            
-            # Convert messages to response format
-            message_responses = [
-                ChatMessageResponse(
-                    id=msg.id,
-                    session_id=msg.session_id,
-                    message_type=msg.message_type,
-                    content=msg.content,
-                    case_data=msg.case_data,
-                    analysis_complete=msg.analysis_complete,
-                    created_at=msg.created_at
-                ) for msg in messages
-            ]
-            
-            return ChatSessionWithMessages(
-                id=session.id,
-                user_id=session.user_id,
-                session_name=session.session_name,
-                case_summary=session.case_summary,
-                is_active=session.is_active,
-                created_at=session.created_at,
-                updated_at=session.updated_at,
-                message_count=len(messages),
-                messages=message_responses
-            )
+            # Messages are read from session.chat_messages
+            return ChatSessionWithMessages.model_validate(session)
             
         except Exception as e:
-            logger.error(f"Error getting case session with messages {session_id}: {e}")
+            logger.error("Error getting case session with messages %s: %s", session_id, e)
             raise
     
     def list_sessions(self, user: User, page: int = 1, per_page: int = 20) -> ChatSessionListResponse:
@@ -142,37 +175,15 @@ class LegalConsultationService:
             offset = (page - 1) * per_page
             
             # Get total count
-            total = self.db.query(func.count(LegalConsultation.id)).filter(
-                LegalConsultation.user_id == user.id
-            ).scalar()
-            
-            # Get sessions with message counts
-            sessions_query = self.db.query(
-                LegalConsultation,
-                func.count(ChatMessage.id).label('message_count')
-            ).outerjoin(
-                ChatMessage, LegalConsultation.id == ChatMessage.session_id
-            ).filter(
-                LegalConsultation.user_id == user.id
-            ).group_by(LegalConsultation.id).order_by(
-                desc(LegalConsultation.updated_at)
-            ).offset(offset).limit(per_page)
+            total = self.db.execute(_STMT_COUNT_SESSIONS, {"uid": user.id}).scalar()
             
-            sessions = sessions_query.all()
+            # Get session rows (message counts are stored on the row)
+            sessions = self.db.execute(
+                _STMT_LIST_SESSIONS, {"uid": user.id, "limit": per_page, "offset": offset}
+            ).all()
             
             # Convert to response format
-            session_responses = [
-                ChatSessionResponse(
-                    id=session.id,
-                    user_id=session.user_id,
-                    session_name=session.session_name,
-                    case_summary=session.case_summary,
-                    is_active=session.is_active,
-                    created_at=session.created_at,
-                    updated_at=session.updated_at,
-                    message_count=message_count or 0
-                ) for session, message_count in sessions
-            ]
+            session_responses = [ChatSessionResponse.model_validate(session) for session in sessions]
             
             return ChatSessionListResponse(
                 sessions=session_responses,
@@ -182,154 +193,135 @@ class LegalConsultationService:
             )
             
         except Exception as e:
-            logger.error(f"Error listing case sessions for user {user.id}: {e}")
+            logger.error("Error listing case sessions for user %s: %s", user.id, e)
             raise
     
     def update_session(self, session_id: int, user: User, update_data: ChatSessionUpdate) -> Optional[ChatSessionResponse]:
         """Update a case session."""
         try:
-            session = self.db.query(LegalConsultation).filter(
-                LegalConsultation.id == session_id,
-                LegalConsultation.user_id == user.id
-            ).first()
-            
-            if not session:
-                return None
-            
             # Update fields
+            values = {"updated_at": func.now()}
             if update_data.session_name is not None:
-                session.session_name = update_data.session_name
+                values["session_name"] = update_data.session_name
             if update_data.case_summary is not None:
-                session.case_summary = update_data.case_summary
+                values["case_summary"] = update_data.case_summary
             if update_data.is_active is not None:
-                session.is_active = update_data.is_active
-            
-            session.updated_at = datetime.utcnow().isoformat()
+                values["is_active"] = update_data.is_active
+            
+            # Ownership check, write and read-back in one UPDATE ... RETURNING
+            row = self.db.execute(
+                update(LegalConsultation).where(
+                    LegalConsultation.id == session_id,
+                    LegalConsultation.user_id == user.id
+                ).values(**values).returning(*_SESSION_COLUMNS),
+                execution_options={"synchronize_session": False}
+            ).one_or_none()
+            
+            if row is None:
+                self.db.rollback()
+                return None
             
             self.db.commit()
-            self.db.refresh(session)
             
-            # Get message count
-            message_count = self.db.query(func.count(ChatMessage.id)).filter(
-                ChatMessage.session_id == session.id
-            ).scalar()
+            logger.info("Updated case session %s for user %s", session_id, user.id)
             
-            logger.info(f"Updated case session {session_id} for user {user.id}")
-            
-            return ChatSessionResponse(
-                id=session.id,
-                user_id=session.user_id,
-                session_name=session.session_name,
-                case_summary=session.case_summary,
-                is_active=session.is_active,
-                created_at=session.created_at,
-                updated_at=session.updated_at,
-                message_count=message_count or 0
-            )
+            return ChatSessionResponse.model_validate(row)
             
         except Exception as e:
-            logger.error(f"Error updating case session {session_id}: {e}")
+            logger.error("Error updating case session %s: %s", session_id, e)
             self.db.rollback()
             raise
     
     def delete_session(self, session_id: int, user: User) -> bool:
         """Delete a case session."""
         try:
-            session = self.db.query(LegalConsultation).filter(
-                LegalConsultation.id == session_id,
-                LegalConsultation.user_id == user.id
-            ).first()
+            # Bulk deletes bypass the ORM cascade, so remove the messages first
+            self.db.execute(_STMT_DELETE_SESSION_MESSAGES, {"sid": session_id, "uid": user.id})
+            result = self.db.execute(_STMT_DELETE_SESSION, {"sid": session_id, "uid": user.id})
             
-            if not session:
+            if result.rowcount == 0:
+                self.db.rollback()
                 return False
             
-            self.db.delete(session)
             self.db.commit()
             
-            logger.info(f"Deleted case session {session_id} for user {user.id}")
+            logger.info("Deleted case session %s for user %s", session_id, user.id)
             return True
             
         except Exception as e:
-            logger.error(f"Error deleting case session {session_id}: {e}")
+            logger.error("Error deleting case session %s: %s", session_id, e)
             self.db.rollback()
             raise
     
     def add_message(self, session_id: int, user: User, message_data: ChatMessageCreate) -> Optional[ChatMessageResponse]:
         """Add a message to a case session."""
+        added = self.add_messages(session_id, user, [message_data])
+        return added[0] if added else None
+    
+    def add_messages(
+        self, session_id: int, user: User, messages: List[ChatMessageCreate]
+    ) -> Optional[List[ChatMessageResponse]]:
+        """
+        Add messages to a case session in a single transaction.
+        
+        Used to store a lawyer message together with the assistant reply, so a
+        failed analysis never leaves a question without its answer.
+        """
         try:
-            # Verify session belongs to user
-            session = self.db.query(LegalConsultation).filter(
-                LegalConsultation.id == session_id,
-                LegalConsultation.user_id == user.id
-            ).first()
+            # Touch the session (database clock); no row back means it isn't the user's
+            touched = self.db.execute(
+                _STMT_TOUCH_SESSION, {"sid": session_id, "uid": user.id, "added": len(messages)}
+            ).scalar_one_or_none()
             
-            if not session:
+            if touched is None:
+                self.db.rollback()
                 return None
             
-            # Create new message
-            new_message = ChatMessage(
-                session_id=session_id,
-                message_type=message_data.message_type,
-                content=message_data.content,
-                case_data=message_data.case_data,
-                analysis_complete=message_data.analysis_complete,
-                created_at=datetime.utcnow().isoformat()
-            )
+            # Insert the messages and read back their generated columns in the same statement
+            rows = self.db.execute(
+                _STMT_INSERT_MESSAGE,
+                [
+                    {
+                        "session_id": session_id,
+                        "message_type": message_data.message_type,
+                        "content": message_data.content,
+                        "case_data": message_data.case_data,
+                        "analysis_complete": message_data.analysis_complete
+                    } for message_data in messages
+                ]
+            ).all()
             
-            self.db.add(new_message)
+            self.db.commit()
             
-            # Update session timestamp
-            session.updated_at = datetime.utcnow().isoformat()
+            logger.info("Added messages %s to session %s", [row[0] for row in rows], session_id)
             
-            self.db.commit()
-            self.db.refresh(new_message)
-            
-            logger.info(f"Added message {new_message.id} to session {session_id}")
-            
-            return ChatMessageResponse(
-                id=new_message.id,
-                session_id=new_message.session_id,
-                message_type=new_message.message_type,
-                content=new_message.content,
-                case_data=new_message.case_data,
-                analysis_complete=new_message.analysis_complete,
-                created_at=new_message.created_at
-            )
+            return [
+                ChatMessageResponse(
+                    id=message_id,
+                    session_id=session_id,
+                    message_type=message_data.message_type,
+                    content=message_data.content,
+                    case_data=message_data.case_data,
+                    analysis_complete=message_data.analysis_complete,
+                    created_at=created_at
+                ) for message_data, (message_id, created_at) in zip(messages, rows)
+            ]
             
         except Exception as e:
-            logger.error(f"Error adding message to session {session_id}: {e}")
+            logger.error("Error adding message to session %s: %s", session_id, e)
             self.db.rollback()
             raise
     
     def get_chat_history(self, session_id: int, user: User) -> str:
         """Get formatted chat history for a session."""
         try:
-            # Verify session belongs to user
-            session = self.db.query(LegalConsultation).filter(
-                LegalConsultation.id == session_id,
-                LegalConsultation.user_id == user.id
-            ).first()
-            
-            if not session:
-                return ""
-            
-            # Get messages ordered by creation time
-            messages = self.db.query(ChatMessage).filter(
-                ChatMessage.session_id == session_id
-            ).order_by(ChatMessage.id.asc()).all()
-            
-            # Format chat history
-            chat_history_parts = []
-            for msg in messages:
-                if msg.message_type == "user":
-                    chat_history_parts.append(f"Lawyer: {msg.content}")
-                elif msg.message_type == "assistant":
-                    chat_history_parts.append(f"AI Assistant: {msg.content}")
-                # Skip system messages in chat history
+            # Formatted in the database (system messages are skipped); NULL when there is none
+            chat_history = self.db.execute(
+                _STMT_HISTORY_TEXT, {"sid": session_id, "uid": user.id}
+            ).scalar()
             
-            return "\n".join(chat_history_parts)
+            return chat_history or ""
             
         except Exception as e:
-            logger.error(f"Error getting chat history for session {session_id}: {e}")
+            logger.error("Error getting chat history for session %s: %s", session_id, e)
             return ""
-            
\ No newline at end of file
@@ -4,13 +4,15 @@ Prompt Manager Module for mamaope_legal AI CDSS.
 This module handles loading and managing prompt templates from JSON files.
 """
 
-import json
 import logging
 from pathlib import Path
-from typing import Dict, Optional, List
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional, List
 from dataclasses import dataclass
 from enum import Enum
 
+import orjson
+
 logger = logging.getLogger(__name__)
 
 
@@ -22,117 +24,11 @@ class QueryType(Enum):
     GENERAL_QUERY = "general_query"
 
 
-@dataclass
-class PromptConfig:
-    """Configuration for a prompt template."""
-    template: str
-    variables: List[str]
-    validation_rules: Dict[str, any]
-    max_length: int
-    description: str
-    version: str
-
-
-class PromptManager:
-    """Manages prompt templates and their configurations."""
-    
-    def __init__(self, config_dir: Optional[Path] = None):
-        """Initialize the prompt manager."""
-        self.config_dir = self._find_config_directory(config_dir)
-        self.prompts: Dict[QueryType, PromptConfig] = {}
-        self._load_prompts()
-    
-    def _find_config_directory(self, config_dir: Optional[Path]) -> Path:
-        """Find the configuration directory."""
-        if config_dir:
-            return config_dir
-        
-        # Try multiple possible paths
-        possible_paths = [
-            Path("/app/config"),  # Docker container path
-            Path(__file__).parent.parent.parent.parent / "config",  # Relative from this file
-            Path("backend/config"),  # Relative from project root
-            Path("./config"),  # Current directory
-        ]
-        
-        for path in possible_paths:
-            logger.info(f"Checking config path: {path}")
-            if path.exists() and (path / "prompts").exists():
-                logger.info(f"Found config directory at: {path}")
-                return path
-        
-        logger.warning("Could not find config directory, using fallback")
-        return Path("/app/config")  # Fallback
-    
-    def _load_prompts(self) -> None:
-        """Load all prompt templates from JSON files."""
-        prompts_dir = self.config_dir / "prompts"
-        
-        logger.info(f"Loading prompts from: {prompts_dir}")
-        
-        if not prompts_dir.exists():
-            logger.warning(f"Prompts directory not found: {prompts_dir}")
-            self._load_default_prompts()
-            return
-        
-        # Load each prompt file
-        prompt_files = {
-            "differential_diagnosis.json": QueryType.DIFFERENTIAL_DIAGNOSIS,
-            "drug_information.json": QueryType.DRUG_INFORMATION,
-            "clinical_guidance.json": QueryType.CLINICAL_GUIDANCE
-        }
-        
-        for filename, query_type in prompt_files.items():
-            file_path = prompts_dir / filename
-            
-            logger.info(f"Loading prompt file: {file_path}")
-            
-            if not file_path.exists():
-                logger.warning(f"Prompt file not found: {file_path}")
-                continue
-            
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    data = json.load(f)
-                
-                prompt_config = PromptConfig(
-                    template=data.get("template", ""),
-                    variables=data.get("variables", []),
-                    validation_rules=data.get("validation_rules", {}),
-                    max_length=data.get("max_length", 8000),
-                    description=data.get("description", ""),
-                    version=data.get("version", "1.0.0")
-                )
-                
-                self.prompts[query_type] = prompt_config
-                logger.info(f"✅ Loaded prompt [{query_type.value}] v{prompt_config.version}: {len(prompt_config.template)} chars")
-                
-            except Exception as e:
-                logger.error(f"Failed to load prompt {filename}: {e}")
-        
-        # Add default prompts for missing types
-        self._add_default_prompts()
-        
-        logger.info(f"Total prompts loaded: {len(self.prompts)}")
-    
-    def _add_default_prompts(self) -> None:
-        """Add default prompts for missing query types."""
-        if QueryType.GENERAL_QUERY not in self.prompts:
-            self.prompts[QueryType.GENERAL_QUERY] = PromptConfig(
-                template="You are a helpful medical AI assistant. Please provide accurate and helpful information based on the user's query.",
-                variables=["query"],
-                validation_rules={},
-                max_length=2000,
-                description="Default general query prompt",
-                version="1.0.0"
-            )
-    
-    def _load_default_prompts(self) -> None:
-        """Load default unified prompt when JSON files are not available."""
-        logger.info("Loading unified GENERAL_PROMPT for all query types")
+# Fallback templates, defined once so every PromptManager (and reload) shares them
+DEFAULT_GENERAL_PROMPT = "You are a helpful medical AI assistant. Please provide accurate and helpful information based on the user's query."
 
-        # Unified prompt for all query types
-        unified_prompt = """
+# Unified prompt for all query types, used when the JSON prompt files are missing
+UNIFIED_PROMPT = """
 YOU ARE **HealthNavy**, A CLINICAL DECISION SUPPORT SYSTEM (CDSS) BUILT USING RETRIEVAL-AUGMENTED GENERATION (RAG) TECHNOLOGY. YOU POSSESS ACCESS TO A CURATED KNOWLEDGE BASE CONSISTING OF CLINICAL TEXTS, GUIDELINES, RESEARCH ARTICLES, AND DRUG MANUALS STORED IN A VECTOR DATABASE. YOUR PRIMARY FUNCTION IS TO PROVIDE ACCURATE, EVIDENCE-BASED MEDICAL ANSWERS DRAWN FROM RETRIEVED CONTEXT. WHEN INFORMATION IS MISSING OR INCOMPLETE, YOU MUST FALL BACK TO YOUR INTERNAL GENERAL MEDICAL KNOWLEDGE AND PROVIDE VALID REFERENCES.
 
 ---
@@ -250,9 +146,118 @@ FOLLOW THIS STEPWISE APPROACH INTERNALLY BEFORE PRODUCING ANY OUTPUT:
 **REFERENCE TEXT (RAG CONTEXT):** {context}
 """
 
+@dataclass(slots=True, frozen=True)
+class PromptConfig:
+    """Configuration for a prompt template (immutable once loaded)."""
+    template: str
+    variables: List[str]
+    validation_rules: Dict[str, Any]
+    max_length: int
+    description: str
+    version: str
+
+
+class PromptManager:
+    """Manages prompt templates and their configurations."""
+    
+    def __init__(self, config_dir: Optional[Path] = None):
+        """Initialize the prompt manager."""
+        self.config_dir = self._find_config_directory(config_dir)
+        self.prompts: Dict[QueryType, PromptConfig] = {}
+        self._load_prompts()
+        # Read-only live view handed out by get_all_prompts (the loaders may rebind self.prompts)
+        self._prompts_view = MappingProxyType(self.prompts)
+    
+    def _find_config_directory(self, config_dir: Optional[Path]) -> Path:
+        """Find the configuration directory."""
+        if config_dir:
+            return config_dir
+        
+        # Try multiple possible paths
+        possible_paths = [
+            Path("/app/config"),  # Docker container path
+            Path(__file__).parent.parent.parent.parent / "config",  # Relative from this file
+            Path("backend/config"),  # Relative from project root
+            Path("./config"),  # Current directory
+        ]
+        
+        for path in possible_paths:
+            logger.info(f"Checking config path: {path}")
+            if path.exists() and (path / "prompts").exists():
+                logger.info(f"Found config directory at: {path}")
+                return path
+        
+        logger.warning("Could not find config directory, using fallback")
+        return Path("/app/config")  # Fallback
+    
+    def _load_prompts(self) -> None:
+        """Load all prompt templates from JSON files."""
+        prompts_dir = self.config_dir / "prompts"
+        
+        logger.info(f"Loading prompts from: {prompts_dir}")
+        
+        if not prompts_dir.exists():
+            logger.warning(f"Prompts directory not found: {prompts_dir}")
+            self._load_default_prompts()
+            return
+        
+        # Load each prompt file
+        prompt_files = {
+            "differential_diagnosis.json": QueryType.DIFFERENTIAL_DIAGNOSIS,
+            "drug_information.json": QueryType.DRUG_INFORMATION,
+            "clinical_guidance.json": QueryType.CLINICAL_GUIDANCE
+        }
+        
+        for filename, query_type in prompt_files.items():
+            file_path = prompts_dir / filename
+            
+            logger.info(f"Loading prompt file: {file_path}")
+            
+            if not file_path.exists():
+                logger.warning(f"Prompt file not found: {file_path}")
+                continue
+            
+            try:
+                data = orjson.loads(file_path.read_bytes())
+                
+                prompt_config = PromptConfig(
+                    template=data.get("template", ""),
+                    variables=data.get("variables", []),
+                    validation_rules=data.get("validation_rules", {}),
+                    max_length=data.get("max_length", 8000),
+                    description=data.get("description", ""),
+                    version=data.get("version", "1.0.0")
+                )
+                
+                self.prompts[query_type] = prompt_config
+                logger.info(f"✅ Loaded prompt [{query_type.value}] v{prompt_config.version}: {len(prompt_config.template)} chars")
+                
+            except Exception as e:
+                logger.error(f"Failed to load prompt {filename}: {e}")
+        
+        # Add default prompts for missing types
+        self._add_default_prompts()
+        
+        logger.info(f"Total prompts loaded: {len(self.prompts)}")
+    
+    def _add_default_prompts(self) -> None:
+        """Add default prompts for missing query types."""
+        if QueryType.GENERAL_QUERY not in self.prompts:
+            self.prompts[QueryType.GENERAL_QUERY] = PromptConfig(
+                template=DEFAULT_GENERAL_PROMPT,
+                variables=["query"],
+                validation_rules={},
+                max_length=2000,
+                description="Default general query prompt",
+                version="1.0.0"
+            )
+    
+    def _load_default_prompts(self) -> None:
+        """Load default unified prompt when JSON files are not available."""
+        logger.info("Loading unified GENERAL_PROMPT for all query types")
         self.prompts = {
             QueryType.DIFFERENTIAL_DIAGNOSIS: PromptConfig(
-                template=unified_prompt,
+                template=UNIFIED_PROMPT,
                 variables=["patient_data", "chat_history", "context", "sources"],
                 validation_rules={
                     "max_patient_data_length": 10000,
@@ -266,7 +271,7 @@ FOLLOW THIS STEPWISE APPROACH INTERNALLY BEFORE PRODUCING ANY OUTPUT:
                 version="1.0.0"
             ),
             QueryType.DRUG_INFORMATION: PromptConfig(
-                template=unified_prompt,
+                template=UNIFIED_PROMPT,
                 variables=["patient_data", "context", "sources", "chat_history"],
                 validation_rules={
                     "max_patient_data_length": 10000,
@@ -279,7 +284,7 @@ FOLLOW THIS STEPWISE APPROACH INTERNALLY BEFORE PRODUCING ANY OUTPUT:
                 version="1.0.0"
             ),
             QueryType.CLINICAL_GUIDANCE: PromptConfig(
-                template=unified_prompt,
+                template=UNIFIED_PROMPT,
                 variables=["patient_data", "context", "sources", "chat_history"],
                 validation_rules={
                     "max_patient_data_length": 10000,
@@ -292,7 +297,7 @@ FOLLOW THIS STEPWISE APPROACH INTERNALLY BEFORE PRODUCING ANY OUTPUT:
                 version="1.0.0"
             ),
             QueryType.GENERAL_QUERY: PromptConfig(
-                template=unified_prompt,
+                template=UNIFIED_PROMPT,
                 variables=["query", "context", "sources"],
                 validation_rules={
                     "max_query_length": 2000,
@@ -309,15 +314,16 @@ FOLLOW THIS STEPWISE APPROACH INTERNALLY BEFORE PRODUCING ANY OUTPUT:
         """Get a prompt configuration for a specific query type."""
         return self.prompts.get(query_type)
     
-    def get_all_prompts(self) -> Dict[QueryType, PromptConfig]:
-        """Get all loaded prompt configurations."""
-        return self.prompts.copy()
+    def get_all_prompts(self) -> Mapping[QueryType, PromptConfig]:
+        """Get a read-only view of all loaded prompt configurations."""
+        return self._prompts_view
     
     def reload_prompts(self) -> None:
         """Reload all prompts from JSON files."""
         logger.info("Reloading prompts...")
         self.prompts.clear()
         self._load_prompts()
+        self._prompts_view = MappingProxyType(self.prompts)
     
     def get_prompt_template(self, query_type: QueryType) -> str:
         """Get the template string for a specific query type."""
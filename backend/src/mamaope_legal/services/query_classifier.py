@@ -6,7 +6,8 @@ This module handles query classification and routing.
 
 import logging
 import re
-from typing import Dict, List, Optional, Tuple
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple
 from dataclasses import dataclass
 from enum import Enum
 
@@ -14,6 +15,12 @@ from .prompt_manager import QueryType
 
 logger = logging.getLogger(__name__)
 
+# Characters that make a rule pattern more than a plain "(a|b|c)" keyword list
+_REGEX_METACHARACTERS = frozenset(".^$*+?{}[]\\|()")
+
+# Distinct classified texts remembered per classifier
+CLASSIFICATION_CACHE_SIZE = 2048
+
 
 @dataclass
 class ClassificationRule:
@@ -30,6 +37,8 @@ class QueryClassifier:
     def __init__(self):
         """Initialize the query classifier."""
         self.rules: List[ClassificationRule] = []
+        # (matcher, rule) in match priority order, rebuilt when rules change
+        self._compiled: List[Tuple[Callable[[str], object], ClassificationRule]] = []
         self._load_classification_rules()
     
     def _load_classification_rules(self) -> None:
@@ -95,40 +104,70 @@ class QueryClassifier:
             )
         ]
         
+        self._compile_rules()
         logger.info(f"Loaded {len(self.rules)} classification rules")
     
+    def _compile_rules(self) -> None:
+        """
+        Compile rule patterns once, ordered by descending confidence.
+        
+        The first match in this order is the most confident one (earlier rules win
+        ties, as before), so classification can stop at the first hit.
+        """
+        ordered = sorted(self.rules, key=lambda rule: rule.confidence, reverse=True)
+        self._compiled = [(self._build_matcher(rule.pattern), rule) for rule in ordered]
+        self._rules_view = tuple(self.rules)
+        # A fresh cache per rule set, so results from old rules are never served
+        self._classify_text = lru_cache(maxsize=CLASSIFICATION_CACHE_SIZE)(self._match_rules)
+    
+    @staticmethod
+    def _build_matcher(pattern: str) -> Callable[[str], object]:
+        """
+        Build a matcher for a rule pattern applied to lowercased text.
+        
+        Plain keyword alternations are matched with substring checks, which avoid
+        the regex engine entirely; anything else is compiled as a regex.
+        """
+        body = pattern[1:-1] if pattern.startswith("(") and pattern.endswith(")") else pattern
+        keywords = tuple(keyword.lower() for keyword in body.split("|"))
+        if all(keywords) and not any(_REGEX_METACHARACTERS.intersection(keyword) for keyword in keywords):
+            return lambda text: any(keyword in text for keyword in keywords)
+        # Text is already lowercased, so case folding is only needed for patterns with capitals
+        flags = re.IGNORECASE if pattern != pattern.lower() else 0
+        return re.compile(pattern, flags).search
+    
     def classify_query(self, query: str, patient_data: str = "") -> Tuple[QueryType, float]:
         """Classify a query into a specific type."""
         if not query:
             return QueryType.GENERAL_QUERY, 0.0
         
         # Combine query and patient data for better classification
-        combined_text = f"{query} {patient_data}".lower()
+        combined_text = (query + " " + patient_data).lower() if patient_data else query.lower()
         
-        best_match = None
-        best_confidence = 0.0
-        
-        for rule in self.rules:
-            if re.search(rule.pattern, combined_text, re.IGNORECASE):
-                if rule.confidence > best_confidence:
-                    best_match = rule.query_type
-                    best_confidence = rule.confidence
-        
-        # If no specific match found, use general query
-        if best_match is None:
-            best_match = QueryType.GENERAL_QUERY
-            best_confidence = 0.1
+        best_match, best_confidence = self._classify_text(combined_text)
         
         logger.info(f"Classified query as {best_match} with confidence {best_confidence}")
         return best_match, best_confidence
     
-    def get_classification_rules(self) -> List[ClassificationRule]:
-        """Get all classification rules."""
-        return self.rules.copy()
+    def _match_rules(self, combined_text: str) -> Tuple[QueryType, float]:
+        """Classify lowercased text against the compiled rules (cached per rule set)."""
+        for matches, rule in self._compiled:
+            if rule.confidence <= 0.0:
+                break
+            if matches(combined_text):
+                return rule.query_type, rule.confidence
+        
+        # If no specific match found, use general query
+        return QueryType.GENERAL_QUERY, 0.1
+    
+    def get_classification_rules(self) -> Tuple[ClassificationRule, ...]:
+        """Get all classification rules (an immutable snapshot, rebuilt when rules change)."""
+        return self._rules_view
     
     def add_classification_rule(self, rule: ClassificationRule) -> None:
         """Add a new classification rule."""
         self.rules.append(rule)
+        self._compile_rules()
         logger.info(f"Added classification rule: {rule.description}")
 
 
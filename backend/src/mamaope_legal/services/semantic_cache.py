@@ -0,0 +1,188 @@
+"""
+Semantic response cache for mamaope_legal AI.
+
+Caches generated answers keyed by the query embedding so that a rephrased
+version of an already-answered question is served without vector search or
+an LLM call. Candidates are found with random-hyperplane LSH (cosine) and
+confirmed with an exact cosine similarity check against the threshold.
+"""
+
+import time
+import logging
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from mamaope_legal.core.constants import (
+    CACHE_TTL_MINUTES, MAX_CACHE_SIZE,
+    SEMANTIC_CACHE_THRESHOLD, SEMANTIC_CACHE_TABLES, SEMANTIC_CACHE_BITS
+)
+
+logger = logging.getLogger(__name__)
+
+
+class SemanticCache:
+    """In-process LSH-indexed cache with LRU + TTL eviction."""
+
+    def __init__(
+        self,
+        threshold: float = SEMANTIC_CACHE_THRESHOLD,
+        num_tables: int = SEMANTIC_CACHE_TABLES,
+        num_bits: int = SEMANTIC_CACHE_BITS,
+        max_size: int = MAX_CACHE_SIZE,
+        ttl_seconds: float = CACHE_TTL_MINUTES * 60,
+        seed: int = 0
+    ):
+        self.threshold = threshold
+        self.num_tables = num_tables
+        self.num_bits = num_bits
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._rng = np.random.default_rng(seed)
+        # Hyperplanes are sized from the first embedding seen
+        self._planes: Optional[np.ndarray] = None
+        self._bit_weights = 1 << np.arange(num_bits, dtype=np.int64)
+        self._tables: List[Dict[int, Set[int]]] = [{} for _ in range(num_tables)]
+        # entry id -> (unit vector, bucket keys, value, stored at); ordered oldest-used first
+        self._entries: "OrderedDict[int, Tuple[np.ndarray, Tuple[int, ...], Any, float]]" = OrderedDict()
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _unit(self, embedding: Sequence[float]) -> Optional[np.ndarray]:
+        """Return the L2-normalised embedding, or None for a zero vector."""
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        if norm == 0.0:
+            return None
+        return vector / norm
+
+    def _bucket_keys(self, vector: np.ndarray) -> Tuple[int, ...]:
+        """Hash a unit vector into one bucket key per table."""
+        if self._planes is None:
+            self._planes = self._rng.standard_normal(
+                (self.num_tables * self.num_bits, vector.shape[0])
+            ).astype(np.float32)
+        bits = (self._planes @ vector > 0).reshape(self.num_tables, self.num_bits)
+        return tuple(int(k) for k in bits @ self._bit_weights)
+
+    def _remove(self, entry_id: int) -> None:
+        """Drop an entry and its bucket memberships. Caller holds the lock."""
+        _, keys, _, _ = self._entries.pop(entry_id)
+        for table, key in zip(self._tables, keys):
+            bucket = table.get(key)
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del table[key]
+
+    def get(self, embedding: Sequence[float]) -> Optional[Any]:
+        """
+        Look up a cached value for a semantically equivalent query.
+
+        Args:
+            embedding: Query embedding
+
+        Returns:
+            Cached value of the most similar entry at or above the threshold, or None
+        """
+        vector = self._unit(embedding)
+        if vector is None:
+            return None
+
+        with self._lock:
+            if self._planes is None or self._planes.shape[1] != vector.shape[0]:
+                self.misses += 1
+                return None
+
+            keys = self._bucket_keys(vector)
+            candidates: Set[int] = set()
+            for table, key in zip(self._tables, keys):
+                candidates.update(table.get(key, ()))
+
+            now = time.monotonic()
+            best_id, best_score = None, self.threshold
+            for entry_id in candidates:
+                stored, _, _, stored_at = self._entries[entry_id]
+                if now - stored_at >= self.ttl_seconds:
+                    self._remove(entry_id)
+                    continue
+                score = float(stored @ vector)
+                if score >= best_score:
+                    best_id, best_score = entry_id, score
+
+            if best_id is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(best_id)
+            self.hits += 1
+            value = self._entries[best_id][2]
+
+        logger.info(f"Semantic cache HIT (similarity: {best_score:.3f})")
+        return value
+
+    def set(self, embedding: Sequence[float], value: Any) -> None:
+        """
+        Store a value under a query embedding.
+
+        Args:
+            embedding: Query embedding
+            value: Value to cache
+        """
+        vector = self._unit(embedding)
+        if vector is None:
+            return
+
+        with self._lock:
+            if self._planes is not None and self._planes.shape[1] != vector.shape[0]:
+                logger.warning("Semantic cache embedding dimension changed; ignoring entry")
+                return
+
+            keys = self._bucket_keys(vector)
+            entry_id = self._next_id
+            self._next_id += 1
+            self._entries[entry_id] = (vector, keys, value, time.monotonic())
+            for table, key in zip(self._tables, keys):
+                table.setdefault(key, set()).add(entry_id)
+
+            # Evict least recently used entries beyond capacity
+            while len(self._entries) > self.max_size:
+                self._remove(next(iter(self._entries)))
+
+    def purge_expired(self) -> int:
+        """Remove all entries older than the TTL. Returns the number removed."""
+        cutoff = time.monotonic() - self.ttl_seconds
+        with self._lock:
+            expired = [entry_id for entry_id, entry in self._entries.items() if entry[3] <= cutoff]
+            for entry_id in expired:
+                self._remove(entry_id)
+        return len(expired)
+
+    def clear(self) -> None:
+        """Remove all entries and reset statistics."""
+        with self._lock:
+            self._entries.clear()
+            for table in self._tables:
+                table.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Cache statistics for health reporting."""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "threshold": self.threshold
+        }
+
+
+# Global cache instance shared by the consultation pipeline
+semantic_cache = SemanticCache()
@@ -1,12 +1,18 @@
 import os
 import time
 import json
-from typing import List, Dict, Tuple, Any
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Tuple, Any, Optional
 from dotenv import load_dotenv
 from pymilvus import MilvusClient
+import numpy as np
 import openai
 import logging
 
+from mamaope_legal.core.constants import EMBEDDING_CACHE_SIZE
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s [%(levelname)s] %(message)s',
@@ -33,6 +39,9 @@ class ZillizService:
                 api_version=os.getenv('API_VERSION', '2024-02-01')
             )
             self.azure_deployment = os.getenv('DEPLOYMENT', 'text-embedding-3-large')
+            # blake2b(text) -> float32 embedding, least recently used first
+            self._embedding_cache: "OrderedDict[bytes, np.ndarray]" = OrderedDict()
+            self._embedding_cache_lock = threading.Lock()
             logger.info("Milvus and Azure OpenAI clients initialized successfully.")
         except Exception as e:
             logger.error(f"Failed to initialize clients: {e}")
@@ -50,8 +59,17 @@ class ZillizService:
 
     def generate_query_embedding(self, query: str) -> list[float]:
         """Generates a 3072-dim embedding for the query using Azure OpenAI."""
+        cache_key = hashlib.blake2b(query.encode('utf-8'), digest_size=16).digest()
+        with self._embedding_cache_lock:
+            cached = self._embedding_cache.get(cache_key)
+            if cached is not None:
+                self._embedding_cache.move_to_end(cache_key)
+        if cached is not None:
+            logger.info(f"🔢 Embedding cache HIT ({len(query)} chars)")
+            return cached.tolist()
+
         try:
-            embedding_start = time.time()
+            embedding_start = time.perf_counter()
             query_length = len(query)
             logger.info(f"🔢 Starting embedding generation for query ({query_length} chars)...")
             
@@ -60,8 +78,12 @@ class ZillizService:
                 model=self.azure_deployment
             )
             embedding = response.data[0].embedding
+            with self._embedding_cache_lock:
+                self._embedding_cache[cache_key] = np.asarray(embedding, dtype=np.float32)
+                if len(self._embedding_cache) > EMBEDDING_CACHE_SIZE:
+                    self._embedding_cache.popitem(last=False)
             
-            embedding_time = time.time() - embedding_start
+            embedding_time = time.perf_counter() - embedding_start
             logger.info(f"✨ Embedding generation completed in {embedding_time:.3f}s - Vector dim: {len(embedding)}")
             return embedding
         except Exception as e:
@@ -87,7 +109,9 @@ class ZillizService:
         search_results.sort(key=lambda x: x.get('distance', 0), reverse=True)
         return search_results[:k]
 
-    def search_legal_knowledge(self, query: str, k: int = 5) -> Tuple[List[Dict[str, Any]], List[str]]:
+    def search_legal_knowledge(
+        self, query: str, k: int = 5, query_embedding: Optional[List[float]] = None
+    ) -> Tuple[List[Dict[str, Any]], List[str]]:
         """
         Searches the legal knowledge collection using semantic similarity.
         Applies MMR diversity reranking to ensure balanced representation across sources.
@@ -96,8 +120,9 @@ class ZillizService:
         Args:
             query: Search query text
             k: Number of results to return
+            query_embedding: Precomputed embedding of the query, if already available
         """
-        search_total_start = time.time()
+        search_total_start = time.perf_counter()
         logger.info(f"🔍 Starting legal knowledge search (k={k})...")
         
         if not self.check_collection_exists():
@@ -106,12 +131,13 @@ class ZillizService:
 
         try:
             # Step 1: Generate query embedding client-side
-            embedding_start = time.time()
-            query_embedding = self.generate_query_embedding(query)
-            embedding_time = time.time() - embedding_start
+            embedding_start = time.perf_counter()
+            if query_embedding is None:
+                query_embedding = self.generate_query_embedding(query)
+            embedding_time = time.perf_counter() - embedding_start
 
             retrieve_k = min(k * 3, 30)
-            vector_search_start = time.time()
+            vector_search_start = time.perf_counter()
             logger.info(f"🎯 Vector search in '{self.collection_name}' (retrieving {retrieve_k}, returning {k})...")
             
             search_results = self.client.search(
@@ -122,7 +148,7 @@ class ZillizService:
                 search_params={"metric_type": "COSINE"}
             )
             
-            vector_search_time = time.time() - vector_search_start
+            vector_search_time = time.perf_counter() - vector_search_start
             logger.info(f"🎯 Vector search completed in {vector_search_time:.3f}s")
 
             if not search_results or not search_results[0]:
@@ -130,17 +156,17 @@ class ZillizService:
                 return "No relevant legal information found in the knowledge base.", []
 
             # Step 3: Apply MMR diversity reranking
-            rerank_start = time.time()
+            rerank_start = time.perf_counter()
             reranked_results = self._apply_mmr_diversity_reranking(
                 search_results[0], 
                 k, 
                 lambda_param=0.5
             )
-            rerank_time = time.time() - rerank_start
+            rerank_time = time.perf_counter() - rerank_start
             logger.info(f"🔄 MMR diversity reranking completed in {rerank_time:.3f}s")
 
             # Step 4: Process and format results
-            processing_start = time.time()
+            processing_start = time.perf_counter()
             reranked_entities = []
             sources = set()
             total_content_length = 0
@@ -156,13 +182,13 @@ class ZillizService:
                     sources.add(document_name)
                     total_content_length += len(content)
 
-            processing_time = time.time() - processing_start
+            processing_time = time.perf_counter() - processing_start
 
             if not reranked_entities:
                 logger.warning("No relevant content extracted from search results.")
                 return [], []
 
-            search_total_time = time.time() - search_total_start
+            search_total_time = time.perf_counter() - search_total_start
             
             # Detailed timing breakdown for search operation
             logger.info(f"📊 SEARCH TIMING BREAKDOWN:")
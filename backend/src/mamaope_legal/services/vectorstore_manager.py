@@ -1,5 +1,6 @@
-from src.mamaope_legal.services.vectordb_service import ZillizService
-from typing import Tuple, List
+from mamaope_legal.services.vectordb_service import ZillizService
+from functools import lru_cache
+from typing import Tuple, List, Optional
 import time
 import logging
 import re, os
@@ -29,6 +30,9 @@ def initialize_vectorstore():
             logger.error(error_message)
             raise RuntimeError(error_message)
 
+# Document names repeat across requests, so resolve each path once
+document_name = lru_cache(maxsize=4096)(os.path.basename)
+
 def find_best_heading(chunks: list[dict]) -> str:
     """
     Find the most likely section or article title
@@ -80,7 +84,7 @@ def build_context(enriched_chunks: list[dict]) -> Tuple[str, List[str]]:
     """
     context_blocks, sources = [], []
     for item in enriched_chunks:
-        src_name = os.path.basename(item["file_path"])
+        src_name = document_name(item["file_path"])
         block = (
             f"[SOURCE: {src_name} ({item['label']})]\n{item['content']}"
         )
@@ -89,12 +93,23 @@ def build_context(enriched_chunks: list[dict]) -> Tuple[str, List[str]]:
             sources.append(src_name)
     return "\n\n".join(context_blocks), sources
 
-def search_all_collections(query: str, case_data: str, k: int = 3) -> Tuple[str, List[str]]:
+def build_search_query(query: str, case_data: str) -> str:
+    """Combine the question and case data into the text that is embedded for retrieval."""
+    return f"{query.strip()}\n{case_data.strip()}".strip()
+
+def embed_search_query(query: str, case_data: str) -> List[float]:
+    """Embed the retrieval query so callers can reuse the vector (e.g. for caching)."""
+    return vectordb_service.generate_query_embedding(build_search_query(query, case_data))
+
+def search_all_collections(
+    query: str, case_data: str, k: int = 3, query_embedding: Optional[List[float]] = None
+) -> Tuple[str, List[str]]:
     """
     Perform semantic retrieval and return optimized context for LLM.
     - Only top-k chunks (most relevant) are included.
+    - query_embedding skips re-embedding when the caller already has it.
     """
-    start_time = time.time()
+    start_time = time.perf_counter()
     client = vectordb_service.client
     collection_name = vectordb_service.collection_name
 
@@ -102,13 +117,15 @@ def search_all_collections(query: str, case_data: str, k: int = 3) -> Tuple[str,
         logger.error("Vector store not initialized.")
         raise RuntimeError("Vector store not initialized. Call initialize_vectorstore() first.")
 
-    full_search_query = f"{query.strip()}\n{case_data.strip()}".strip()
+    full_search_query = build_search_query(query, case_data)
     logger.info(f"🔍 Running semantic retrieval (query length={len(full_search_query)})")
 
     try:
         # OPTIMIZATION: Retrieve only 2x chunks instead of 5x for faster search
         # This reduces vector search time significantly
-        raw_chunks, all_sources = vectordb_service.search_legal_knowledge(full_search_query, k=k*2)
+        raw_chunks, all_sources = vectordb_service.search_legal_knowledge(
+            full_search_query, k=k*2, query_embedding=query_embedding
+        )
 
         if not raw_chunks or not all_sources:
             logger.warning("No relevant context found by vectordb_service.")
@@ -120,9 +137,9 @@ def search_all_collections(query: str, case_data: str, k: int = 3) -> Tuple[str,
 
         unique_top_sources = set()
         for chunk in top_chunks:
-            unique_top_sources.add(os.path.basename(chunk.get("file_path", "Unknown document")))
+            unique_top_sources.add(document_name(chunk.get("file_path", "Unknown document")))
 
-        total_time = time.time() - start_time
+        total_time = time.perf_counter() - start_time
         logger.info(f"📚 Retrieved {len(top_chunks)} top chunks in {total_time:.2f}s from {len(unique_top_sources)} sources.")
         return top_chunks, list(unique_top_sources)
 